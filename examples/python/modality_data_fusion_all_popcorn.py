@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from popcorn.utils import readConfigs, convertStrToListCol
+from popcorn.utils import readConfigs
 from popcorn.modalities.fuse_all import createMultimodalDF
 from popcorn.datasets.mmtf14k.helper_audio import loadAudioFusedDF
 from popcorn.datasets.poison_rag_plus.loader import loadPoisonRagPlus
@@ -39,9 +39,8 @@ def main():
     for itemId in sampleCommonItemIds:
         url = generateMovieAggEmbeddingUrl("full_movies_agg", "incp3", itemId)
         urlList.append(url)
-    dfAggEmbedsMax, dfAggEmbedsMean = loadAggEmbeddings(urlList)
+    dfAggEmbedsMax, dfAggEmbedsMean = loadAggEmbeddings(urlList, asString=False)
     visualDF = dfAggEmbedsMax
-    visualDF["visual"] = convertStrToListCol(visualDF, "visual")
     print(
         f"- Loaded {len(dfAggEmbedsMax)} sample records of aggregated features ({visualDF.shape}!"
     )
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import os
+import pandas as pd
+from popcorn.utils import readConfigs
+from popcorn.recommenders.metrics import calculateMeanRecMetricsFromStore
+
+
+def main():
+    print(
+        "Welcome to 'Popcorn' 🍿! Starting the framework for your movie recommendation ...\n"
+    )
+    # Read the configuration file
+    configs = readConfigs("popcorn/config/config.yml")
+    # If properly read, print the configurations
+    if not configs:
+        print("Error reading the configuration file!")
+        return
+    # Locate a recommendation list store written by 'generateLists' (e.g., top-20 lists)
+    outputPath = configs["general"]["output_path"] or os.path.join(
+        configs["general"]["root_path"], "outputs"
+    )
+    storePath = os.path.join(outputPath, "reclist_ml1m_vbpr_llama_aug_top20")
+    if not os.path.exists(storePath):
+        print(f"- No recommendation list store found in '{storePath}'! Exiting ...")
+        return
+    # Recalculate the metrics at shorter cutoffs, without any model
+    for cutoff in [5, 10, 20]:
+        print(f"\n- Metrics at cutoff {cutoff}:")
+        metricRows = calculateMeanRecMetricsFromStore(storePath, cutoff)
+        print(pd.DataFrame(metricRows).to_string(index=False))
+    # Recalculate only the accuracy metrics
+    print("\n- Accuracy metrics at cutoff 10:")
+    metricRows = calculateMeanRecMetricsFromStore(storePath, 10, ["ND", "RC", "PR", "AP"])
+    print(pd.DataFrame(metricRows).to_string(index=False))
+    # Stop
+    print("\nStopping 'Popcorn'!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+from popcorn.utils import readConfigs
+from popcorn.recommenders.assembler import assembleModality
+from popcorn.recommenders.service import Recommender, serveRecommender
+
+
+def main():
+    print(
+        "Welcome to 'Popcorn' 🍿! Starting the framework for your movie recommendation ...\n"
+    )
+    # Read the configuration file
+    configs = readConfigs("popcorn/config/config.yml")
+    # If properly read, print the configurations
+    if not configs:
+        print("Error reading the configuration file!")
+        return
+    # The final models must have been saved into the registry by a previous grid search
+    if not configs["recommender"]["registry_path"]:
+        print("- No model registry configured ('recommender.registry_path')! Exiting ...")
+        return
+    # Assemble the same training data the registered models were fitted on
+    configs["datasets"]["unimodal"]["movielens"]["version"] = "1m"  # Use MovieLens 1M
+    trainDF, testDF, trainSet, modalitiesDict, genreDict = assembleModality(configs)
+    if trainSet is None:
+        print("- Error in assembling modalities! Exiting ...")
+        return
+    # Load the registered models once and serve them
+    service = Recommender(configs, trainSet)
+    if not service.models:
+        print("- No registered models found for this training data! Exiting ...")
+        return
+    sampleUser = trainDF["user_id"].iloc[0]
+    print(f"- Sample recommendations for user '{sampleUser}': {service.recommend(sampleUser)}")
+    # Try: curl 'http://127.0.0.1:8080/recommend?user=1&n=10' or curl 'http://127.0.0.1:8080/stats'
+    serveRecommender(service)
+    service.close()
+    # Stop
+    print("\nStopping 'Popcorn'!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 import zipfile
 import requests
+from popcorn.utils import httpGet
 from popcorn.datasets.ml_thumbnail.utils import RAW_DATA_URL, isValidPart
 
 
@@ -46,7 +47,7 @@ def downloadMovieLensThumbnailImages(partId: str, downloadPath: str):
     try:
         # Download the dataset
         print(f"- Fetching data from '{url}' ...")
-        response = requests.get(url)
+        response = httpGet(url)
         response.raise_for_status()
         # Save the downloaded file
         with open(folderZip, "wb") as file:
@@ -1,5 +1,7 @@
+import io
 import numpy as np
 import pandas as pd
+from popcorn.utils import fetchUrl, OfflineCacheMissError
 from popcorn.datasets.ml_thumbnail.utils import (
     MAX_PARTS,
     isValidPart,
@@ -37,7 +39,7 @@ def loadMovieLensThumbnailEmbeddings(partId: int, variant: str) -> pd.DataFrame:
     url = EMBEDDINGS_URL.format(part_id=partId, variant=variant)
     print(f"- Fetching embeddings from '{url}' ...")
     try:
-        embeddings = pd.read_csv(url)
+        embeddings = pd.read_csv(io.BytesIO(fetchUrl(url)))
         # Rename 'movie_id' column to ensure consistency
         embeddings.rename(columns={"movie_id": "item_id"}, inplace=True)
         embeddings["item_id"] = embeddings.item_id.astype(str)
@@ -52,6 +54,8 @@ def loadMovieLensThumbnailEmbeddings(partId: int, variant: str) -> pd.DataFrame:
         )
         # Return the processed DataFrame
         return embeddings[["item_id", "visual"]]
+    except OfflineCacheMissError:
+        raise
     except Exception as e:
         print(f"- [Error] Error loading embeddings from '{url}': {e}")
         return pd.DataFrame()
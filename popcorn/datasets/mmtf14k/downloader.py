@@ -1,6 +1,7 @@
 import os
 import zipfile
 import requests
+from popcorn.utils import httpGet
 from popcorn.datasets.mmtf14k.utils import ORIG_URL
 
 
@@ -34,7 +35,7 @@ def downloadMMTF14k(downloadPath: str):
     try:
         # Download the dataset
         print(f"- Fetching data from '{ORIG_URL}' ...")
-        response = requests.get(ORIG_URL)
+        response = httpGet(ORIG_URL)
         response.raise_for_status()
         # Save the downloaded file
         datasetZip = os.path.join(downloadPath, "mmtf14k.zip")
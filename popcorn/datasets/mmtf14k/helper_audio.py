@@ -1,6 +1,7 @@
+import io
 import numpy as np
 import pandas as pd
-from popcorn.utils import parseSafe
+from popcorn.utils import parseVectorColumn, fetchUrl, OfflineCacheMissError
 from sklearn.decomposition import PCA
 from sklearn.preprocessing import StandardScaler
 from popcorn.datasets.mmtf14k.utils import (
@@ -31,18 +32,16 @@ def loadAudioFusedCsv(url: str) -> pd.DataFrame:
     if not url or not isinstance(url, str):
         print(f"- [Error] Invalid URL: '{url}'! Returning an empty DataFrame ...")
         return audioFusedDF
-    # Parse embeddings safely
-    parse = parseSafe
     # Read CSV with optimized memory usage
     try:
         # Read the CSV file
-        audioFusedDF = pd.read_csv(url, low_memory=False)
+        audioFusedDF = pd.read_csv(io.BytesIO(fetchUrl(url)), low_memory=False)
         # Clean up DataFrame
         audioFusedDF.drop(columns=["title", "genres"], errors="ignore", inplace=True)
-        # Convert embeddings from string to numpy arrays
-        audioFusedDF["embedding"] = (
-            audioFusedDF["embedding"].astype(str).str.replace(",", " ").apply(parse)
-        )
+        # Convert embeddings from string to numpy arrays (in bulk, dropping malformed rows)
+        matrix, badRows = parseVectorColumn(audioFusedDF["embedding"])
+        audioFusedDF["embedding"] = list(matrix)
+        audioFusedDF = audioFusedDF.loc[~badRows].copy()
         # Rename 'itemId' column to ensure consistency
         audioFusedDF.rename(columns={"itemId": "item_id"}, inplace=True)
         # Return the processed DataFrame
@@ -105,6 +104,8 @@ def loadAudioFusedDF(config: dict) -> pd.DataFrame:
             print(f"- Fetched {len(dfAudio):,} audio items using 'i-vector' features.")
             # Return the processed DataFrame
             return dfAudio
+        except OfflineCacheMissError:
+            raise
         except Exception as e:
             print(f"- [Error] Failed to load 'i-vector' audio features: {e}")
             return pd.DataFrame()
@@ -157,6 +158,8 @@ def loadAudioFusedDF(config: dict) -> pd.DataFrame:
             )
             # Return the processed DataFrame
             return dfAudio
+        except OfflineCacheMissError:
+            raise
         except Exception as e:
             print(f"- [Error] Failed to load 'blf' audio features: {e}")
             return pd.DataFrame()
@@ -1,5 +1,6 @@
+import io
 import pandas as pd
-from popcorn.utils import parseSafe
+from popcorn.utils import parseVectorColumn, fetchUrl, OfflineCacheMissError
 from popcorn.datasets.mmtf14k.utils import (
     VIS_FUSED_URL,
     VIS_FUSED_FILE_MAP,
@@ -33,7 +34,6 @@ def loadVisualFusedDF(config: dict) -> pd.DataFrame:
         )
         return dfVisual
     # Extract configuration parameters
-    parse = parseSafe
     variant = config["datasets"]["multimodal"]["mmtf"]["visual_variant"]
     # Check variant
     if variant not in SUPPORTED_VIS_VARIANTS:
@@ -46,15 +46,21 @@ def loadVisualFusedDF(config: dict) -> pd.DataFrame:
     # Handle visual variants
     try:
         # Read the CSV file
-        dfVisual = pd.read_csv(VIS_FUSED_URL + VIS_FUSED_FILE_MAP[variant])
+        dfVisual = pd.read_csv(
+            io.BytesIO(fetchUrl(VIS_FUSED_URL + VIS_FUSED_FILE_MAP[variant]))
+        )
         # Rename 'itemId' column to ensure consistency
         dfVisual.rename(columns={"itemId": "item_id"}, inplace=True)
-        # Parse embeddings from string to numpy arrays
-        dfVisual["visual"] = dfVisual.embedding.map(parse)
+        # Parse embeddings from string to numpy arrays (in bulk, dropping malformed rows)
+        matrix, badRows = parseVectorColumn(dfVisual.embedding)
+        dfVisual["visual"] = list(matrix)
+        dfVisual = dfVisual.loc[~badRows].copy()
         dfVisual["item_id"] = dfVisual.item_id.astype(str)
         print(f"- Fetched {len(dfVisual):,} visual items using '{variant}' features.")
         # Return the processed DataFrame
         return dfVisual[["item_id", "visual"]]
+    except OfflineCacheMissError:
+        raise
     except Exception as e:
         print(f"- [Error] Failed to load visual features: {e}")
         return pd.DataFrame()
@@ -1,6 +1,7 @@
 import os
 import zipfile
 import requests
+from popcorn.utils import httpGet
 from popcorn.datasets.movielens.utils import ML1M_URL, ML25M_URL, ML100K_URL
 
 
@@ -67,7 +68,7 @@ def downloadMovieLens(version: str, downlpadPath: str):
             return False
         # Download the dataset
         print(f"- Fetching data from '{url}' ...")
-        response = requests.get(url)
+        response = httpGet(url)
         response.raise_for_status()
         # Save the downloaded file
         datasetZip = os.path.join(downlpadPath, f"ml-{version}.zip")
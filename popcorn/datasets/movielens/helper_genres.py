@@ -1,5 +1,6 @@
 import os
 import json
+import numpy as np
 import pandas as pd
 from popcorn.datasets.movielens.utils import mainGenres, allGenres
 
@@ -36,7 +37,50 @@ def normalizeGenres(value):
     return []
 
 
-def getGenreDict(itemsDF: pd.DataFrame, config: dict, saveOutput: bool = True) -> dict:
+def getGenreMatrix(genreDict: dict, itemIds: list, missingGenre: str = "(none)"):
+    """
+    Get a multi-hot (items x genres) matrix for the given item IDs.
+    Items are looked up by their string ID (e.g., both '12' and 12.0 match '12').
+    [Note]: items missing from the dictionary are marked with the 'missingGenre'
+    column, which is always the last one.
+
+    Parameters:
+    ----------
+    genreDict: dict
+        A dictionary mapping item IDs (as strings) to their genres.
+    itemIds: list
+        The item IDs defining the order of the rows.
+    missingGenre: str
+        The genre name given to items without genre information.
+
+    Returns:
+    -------
+    genreMatrix: np.ndarray
+        A float32 (items x genres) array counting the genres of each item.
+    genreNames: list
+        The genre names of the columns, ending with 'missingGenre'.
+    """
+    # Variables
+    genreNames = sorted({g for gList in genreDict.values() for g in gList} - {missingGenre})
+    genreNames.append(missingGenre)
+    genreIdx = {g: i for i, g in enumerate(genreNames)}
+    genreMatrix = np.zeros((len(itemIds), len(genreNames)), dtype=np.float32)
+    # Fill the matrix row by row (once per item)
+    for row, itemId in enumerate(itemIds):
+        gList = genreDict.get(str(itemId))
+        if gList is None and isinstance(itemId, float) and itemId.is_integer():
+            gList = genreDict.get(str(int(itemId)))
+        for genre in gList if gList is not None else [missingGenre]:
+            genreMatrix[row, genreIdx[genre]] += 1
+    return genreMatrix, genreNames
+
+
+def getGenreDict(
+    itemsDF: pd.DataFrame,
+    config: dict,
+    saveOutput: bool = True,
+    returnMatrix: bool = False,
+):
     """
     Get a dictionary mapping item IDs to their genres.
 
@@ -48,11 +92,17 @@ def getGenreDict(itemsDF: pd.DataFrame, config: dict, saveOutput: bool = True) -
         The configuration dictionary loaded from the config.yml file.
     saveOutput: bool
         Whether to save the genres DataFrame as a CSV file.
+    returnMatrix: bool
+        Whether to also return the multi-hot item-genre matrix (rows follow 'itemsDF').
 
     Returns:
     -------
     genreDict: dict
         A dictionary mapping item IDs to their genres.
+    genreMatrix: np.ndarray
+        The (items x genres) multi-hot matrix (only if 'returnMatrix' is True).
+    genreNames: list
+        The genre names of the matrix columns (only if 'returnMatrix' is True).
     """
     # Variables
     genresDF = itemsDF[["item_id", "genres"]].copy()
@@ -84,7 +134,10 @@ def getGenreDict(itemsDF: pd.DataFrame, config: dict, saveOutput: bool = True) -
             print(f"- Error in saving the genres DataFrame: {e}")
     else:
         print(f"- Skipping saving the genres DataFrame ...")
-    # Return the genres dictionary
+    # Return the genres dictionary (and matrix, if requested)
+    if returnMatrix:
+        genreMatrix, genreNames = getGenreMatrix(genresDict, genresDF.item_id.tolist())
+        return genresDict, genreMatrix, genreNames
     return genresDict
 
 
@@ -1,9 +1,52 @@
+import io
+import numpy as np
 import pandas as pd
 from typing import List
-from popcorn.utils import parseSafe
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from popcorn.utils import parseVectorColumn, fetchMany
 from popcorn.datasets.poison_rag_plus.utils import PRP_ML_URL, SUPPORTED_LLMS
 
 
+# In-process memo of the loaded datasets, keyed by (llm, augmented, max parts)
+_poisonRagPlusMemo = OrderedDict()
+# Maximum number of memoized datasets (one per LLM and variant), least recently used first out
+POISON_RAG_PLUS_MEMO_SIZE = 6
+
+
+def clearPoisonRagPlusMemo():
+    """
+    Release the memoized Poison-RAG-Plus datasets (the next calls load them again).
+    """
+    _poisonRagPlusMemo.clear()
+
+
+def _copyTextDF(itemsTextDF: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy a dataset with its own embedding arrays, so that callers can modify them in place
+    without altering the memoized dataset.
+    """
+    textCopyDF = itemsTextDF.copy()
+    if len(textCopyDF):
+        textCopyDF["text"] = list(np.vstack(itemsTextDF.text.to_numpy()))
+    return textCopyDF
+
+
+def _parsePart(content: bytes) -> pd.DataFrame:
+    """
+    Decompress and parse a part of the dataset, with its embeddings parsed in bulk into a
+    float32 matrix (columns: item_id, text). Returns None if the part is empty.
+    """
+    try:
+        dataFrame = pd.read_csv(io.BytesIO(content), compression="gzip")
+    except pd.errors.EmptyDataError:
+        return None
+    # Parse all embedding strings at once (dropping the malformed rows)
+    matrix, badRows = parseVectorColumn(dataFrame.embeddings)
+    textDF = pd.DataFrame({"item_id": dataFrame.itemId, "text": list(matrix)})
+    return textDF.loc[~badRows].copy()
+
+
 def loadPoisonRagPlus(config: dict) -> pd.DataFrame:
     """
     Load and prepare the Poison-RAG-Plus dataset based on the provided configuration.
@@ -23,13 +66,12 @@ def loadPoisonRagPlus(config: dict) -> pd.DataFrame:
 
     Notes
     -----
-    The function attempts to load parts sequentially until either:
-        1. The maximum number of parts is reached.
-        2. A part file is not found (indicating end of available parts).
+    All parts (up to the maximum number of parts) are probed and fetched concurrently,
+    the missing ones being skipped. Loaded datasets are memoized per LLM and variant
+    (see 'clearPoisonRagPlusMemo'), each call getting its own copy of the embeddings,
+    so repeated calls in the same process skip the downloads and parsing.
     """
     # Variables
-    parse = parseSafe
-    itemsTextDF = pd.DataFrame()
     dataFrames: List[pd.DataFrame] = []
     LLM = config["datasets"]["unimodal"]["poison_rag_plus"]["llm"]
     DATASET_NAME = config["datasets"]["unimodal"]["poison_rag_plus"]["name"]
@@ -47,40 +89,48 @@ def loadPoisonRagPlus(config: dict) -> pd.DataFrame:
     if MAX_PARTS <= 0 or MAX_PARTS >= 30:
         print(f"- [Warn] Test ratio should be in (0, 30)! Setting to 15 ...")
         MAX_PARTS = 15
+    # Reuse the dataset if it was already loaded
+    memoKey = (LLM, bool(AUGMENTED), MAX_PARTS)
+    if memoKey in _poisonRagPlusMemo:
+        _poisonRagPlusMemo.move_to_end(memoKey)
+        itemsTextDF = _poisonRagPlusMemo[memoKey]
+        print(f"- Reusing the loaded textual {tag} data with {len(itemsTextDF):,} items!")
+        return _copyTextDF(itemsTextDF)
     # Determine base URL and prefix based on configuration
     fileNameAugmented: str = f"{LLM}_enriched_description_part"
     fileNameOriginal: str = f"{LLM}_originalraw_combined_all_part"
     fileName: str = fileNameAugmented if AUGMENTED else fileNameOriginal
-    # Load and process parts sequentially
-    for item in range(1, MAX_PARTS + 1):
-        url: str = f"{PRP_ML_URL}{fileName}{item}.csv.gz"
-        print(f"-- Loading data from '{fileName}{item}.csv.gz' ...")
-        try:
-            # Read and process each part
-            dataFrame = pd.read_csv(url, compression="gzip")
-            dataFrame["text"] = dataFrame.embeddings.map(parse)
-            dataFrame.rename(columns={"itemId": "item_id"}, inplace=True)
-            dataFrames.append(dataFrame[["item_id", "text"]])
-        except pd.errors.EmptyDataError:
-            print(f"- [Warning] Empty data file found at part {item}")
-            break
-        except Exception as e:
-            # Stop loading if any part is not found or other error occurs
-            if not dataFrames:
-                raise RuntimeError(
-                    f"- [Error] Failed to load any text embedding parts: {str(e)}"
-                )
-            break
+    # Probe and fetch all parts concurrently
+    parts = list(range(1, MAX_PARTS + 1))
+    urls = [f"{PRP_ML_URL}{fileName}{item}.csv.gz" for item in parts]
+    print(f"-- Loading data from '{fileName}[1-{MAX_PARTS}].csv.gz' ...")
+    contents = fetchMany(urls)
+    found = [(item, c) for item, c in zip(parts, contents) if c is not None]
+    # Decompress and parse the parts concurrently
+    if found:
+        with ThreadPoolExecutor(max_workers=len(found)) as ex:
+            parsed = list(ex.map(_parsePart, [c for _, c in found]))
+        for (item, _), dataFrame in zip(found, parsed):
+            if dataFrame is None:
+                print(f"- [Warning] Empty data file found at part {item}")
+                continue
+            dataFrames.append(dataFrame)
     # Ensure at least one part was loaded successfully
     if not dataFrames:
         raise ValueError(
             "- [Error] No text embedding parts were loaded successfully! Exiting ..."
         )
+    missing = [item for item, c in zip(parts, contents) if c is None]
+    if missing and missing[0] < found[-1][0]:
+        print(f"- [Warning] Missing text embedding parts {missing} were skipped!")
     # Combine all parts and remove duplicates
-    itemsTextDF = pd.concat(dataFrames).drop_duplicates("item_id")
+    itemsTextDF = pd.concat(dataFrames, ignore_index=True).drop_duplicates("item_id")
     itemsTextDF["item_id"] = itemsTextDF.item_id.astype(str)
     print(
         f"- Finished loading {len(dataFrames)} parts of textual {tag} data with {len(itemsTextDF):,} items!"
     )
+    _poisonRagPlusMemo[memoKey] = itemsTextDF
+    while len(_poisonRagPlusMemo) > POISON_RAG_PLUS_MEMO_SIZE:
+        _poisonRagPlusMemo.popitem(last=False)
     # Return
-    return itemsTextDF
+    return _copyTextDF(itemsTextDF)
@@ -1,5 +1,7 @@
+import json
+import numpy as np
 import pandas as pd
-from popcorn.utils import loadJsonFromUrl
+from popcorn.utils import loadJsonFromUrl, fetchMany
 from popcorn.datasets.popcorn.helper_metadata import fetchAllMovieIds
 from popcorn.datasets.popcorn.utils import (
     RAW_DATA_URL,
@@ -177,14 +179,104 @@ def fetchMovieAggEmbeddings(embedding: str, cnn: str, movieId: int) -> list:
     return aggEmbeddingList
 
 
-def loadAggEmbeddings(aggEmbeddingUrlList: list) -> tuple:
+def loadAggEmbeddingMatrices(
+    aggEmbeddingUrlList: list, batchSize: int = 1000, keepText: bool = False
+) -> dict:
+    """
+    Loads aggregated features from a list of URLs (fetched concurrently) into two float32
+    matrices (Max and Mean) aligned with an array of item IDs.
+
+    Parameters
+    ----------
+    aggEmbeddingUrlList: list
+        A list of URLs pointing to the aggregated feature JSON files.
+    batchSize: int, optional
+        The number of files fetched concurrently before being parsed (default is 1000).
+    keepText: bool, optional
+        Whether to also keep the features as comma-separated strings of the JSON values,
+        at their full precision (default is False).
+
+    Returns
+    -------
+    aggEmbeddings: dict
+        The 'item_id' array (strings) and the 'max' and 'mean' (n, d) float32 matrices
+        (with the 'max_text' and 'mean_text' string arrays if 'keepText' is set),
+        or an empty dictionary if no features were loaded.
+    """
+    # Variables
+    counter, skipped = 0, 0
+    maxMatrix, meanMatrix = None, None
+    # Check input
+    if not aggEmbeddingUrlList or not isinstance(aggEmbeddingUrlList, list):
+        print(f"- [Error] No valid list of addresses provided! Stopping ...")
+        return {}
+    itemIds = np.empty(len(aggEmbeddingUrlList), dtype=object)
+    if keepText:
+        maxTexts = np.empty(len(aggEmbeddingUrlList), dtype=object)
+        meanTexts = np.empty(len(aggEmbeddingUrlList), dtype=object)
+    # Fetch the addresses batch by batch (concurrently inside each batch)
+    for begin in range(0, len(aggEmbeddingUrlList), batchSize):
+        urls = aggEmbeddingUrlList[begin : begin + batchSize]
+        for url, content in zip(urls, fetchMany(urls)):
+            try:
+                jsonData = json.loads(content)
+                aggFeatMax = np.asarray(jsonData[0]["Max"], dtype=np.float32)
+                aggFeatMean = np.asarray(jsonData[0]["Mean"], dtype=np.float32)
+            except (TypeError, ValueError, KeyError, IndexError):
+                skipped += 1
+                continue
+            # Preallocate the matrices with the dimension of the first features
+            if maxMatrix is None:
+                maxMatrix = np.empty(
+                    (len(aggEmbeddingUrlList), aggFeatMax.size), dtype=np.float32
+                )
+                meanMatrix = np.empty_like(maxMatrix)
+            dim = maxMatrix.shape[1]
+            if aggFeatMax.size != dim or aggFeatMean.size != dim:
+                skipped += 1
+                continue
+            itemIds[counter] = str(int(url.split("/")[-1].split(".")[0]))
+            maxMatrix[counter], meanMatrix[counter] = aggFeatMax, aggFeatMean
+            # Convert the JSON lists to strings, like "0.1,0.2,0.3"
+            if keepText:
+                maxTexts[counter] = ",".join(map(str, jsonData[0]["Max"]))
+                meanTexts[counter] = ",".join(map(str, jsonData[0]["Mean"]))
+            counter += 1
+        # Better logging for the user
+        done = min(begin + batchSize, len(aggEmbeddingUrlList))
+        print(
+            f"- Loading aggregated features ({int(done / len(aggEmbeddingUrlList) * 100)}%) ..."
+        )
+    if skipped:
+        print(
+            f"- [Warning] Skipped {skipped} missing or malformed aggregated feature files!"
+        )
+    if counter == 0:
+        return {}
+    aggEmbeddings = {
+        "item_id": itemIds[:counter].astype(str),
+        "max": maxMatrix[:counter],
+        "mean": meanMatrix[:counter],
+    }
+    if keepText:
+        aggEmbeddings["max_text"] = maxTexts[:counter]
+        aggEmbeddings["mean_text"] = meanTexts[:counter]
+    # Return
+    return aggEmbeddings
+
+
+def loadAggEmbeddings(aggEmbeddingUrlList: list, asString: bool = True) -> tuple:
     """
     Loads aggregated features from a list of URLs into two DataFrames (Max and Mean).
+    See 'loadAggEmbeddingMatrices' for the columnar (matrix) variant.
 
     Parameters
     ----------
     aggEmbeddingUrlList: list
         A list of URLs pointing to the aggregated feature JSON files.
+    asString: bool, optional
+        Whether to store the features as comma-separated strings of the JSON values,
+        like "0.1,0.2,0.3" (default is True), or as float32 arrays.
 
     Returns
     -------
@@ -193,47 +285,21 @@ def loadAggEmbeddings(aggEmbeddingUrlList: list) -> tuple:
     dfAggEmbedsMean: pd.DataFrame
         A DataFrame containing the 'Mean' aggregated features.
     """
-    # Variables
-    counter = 0
-    dfAggEmbedsMax = pd.DataFrame()
-    dfAggEmbedsMean = pd.DataFrame()
-    # Check input
-    if not aggEmbeddingUrlList or not isinstance(aggEmbeddingUrlList, list):
-        print(f"- [Error] No valid list of addresses provided! Stopping ...")
+    # Load the features as matrices
+    aggEmbeddings = loadAggEmbeddingMatrices(aggEmbeddingUrlList, keepText=asString)
+    if not aggEmbeddings:
         return pd.DataFrame(), pd.DataFrame()
-    # Loop over all addresses
-    for url in aggEmbeddingUrlList:
-        # Variables
-        itemId = url.split("/")[-1].split(".")[0]
-        # Fetch the JSON data from the URL
-        jsonData = loadJsonFromUrl(url)
-        aggFeatMax, aggFeatMean = jsonData[0]["Max"], jsonData[0]["Mean"]
-        # Convert the list to a string, like "0.1,0.2,0.3"
-        aggFeatMax = ",".join(map(str, aggFeatMax))
-        aggFeatMean = ",".join(map(str, aggFeatMean))
-        # Append to the DataFrames
-        dfAggEmbedsMax = pd.concat(
-            [
-                dfAggEmbedsMax,
-                pd.DataFrame([{"item_id": int(itemId), "visual": aggFeatMax}]),
-            ],
-            ignore_index=True,
+    # Wrap them into DataFrames (item_id, visual)
+    dataFrames = []
+    for variant in ["max", "mean"]:
+        visual = (
+            list(aggEmbeddings[f"{variant}_text"])
+            if asString
+            else list(aggEmbeddings[variant])
         )
-        dfAggEmbedsMean = pd.concat(
-            [
-                dfAggEmbedsMean,
-                pd.DataFrame([{"item_id": int(itemId), "visual": aggFeatMean}]),
-            ],
-            ignore_index=True,
+        dataFrames.append(
+            pd.DataFrame({"item_id": aggEmbeddings["item_id"], "visual": visual})
         )
-        # Better logging for the user
-        counter += 1
-        if counter % 20 == 0:
-            print(
-                f"- Loading aggregated features ({int(counter / len(aggEmbeddingUrlList) * 100)}%) ..."
-            )
-    # Normalize item_id to string
-    dfAggEmbedsMax["item_id"] = dfAggEmbedsMax.item_id.astype(str)
-    dfAggEmbedsMean["item_id"] = dfAggEmbedsMean.item_id.astype(str)
+    dfAggEmbedsMax, dfAggEmbedsMean = dataFrames
     # Return
     return dfAggEmbedsMax, dfAggEmbedsMean
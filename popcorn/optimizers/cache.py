@@ -0,0 +1,203 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from datetime import datetime
+from popcorn.recommenders.registry import (
+    _hashArray,
+    saveModel,
+    loadModel,
+    getDataFingerprint,
+    getModalityFingerprint,
+)
+
+# Version of the on-disk trial cache layout
+TRIAL_CACHE_VERSION = 1
+
+
+def getSplitFingerprint(trainFitSet, valData: dict) -> str:
+    """
+    Fingerprint an HPO split by its training interactions and validation ground truth.
+
+    Parameters
+    ----------
+    trainFitSet: cornac.data.Dataset
+        The training dataset used for fitting the trials.
+    valData: dict
+        The validation data prepared by 'prepareValidation'.
+
+    Returns
+    -------
+    str
+        The SHA-1 hex digest of the split.
+    """
+    hasher = hashlib.sha1(getDataFingerprint(trainFitSet).encode())
+    gtMatrix = valData["gt_matrix"].tocsr()
+    _hashArray(hasher, np.asarray(valData["user_idx"]))
+    for array in (gtMatrix.indptr, gtMatrix.indices):
+        _hashArray(hasher, array)
+    return hasher.hexdigest()
+
+
+def getTrialCache(config: dict, dataDict: dict, fitArgs: tuple = ()) -> dict:
+    """
+    Get the trial cache settings of an HPO search, or None if the cache is disabled.
+    The split fingerprint is computed once and kept in the data dictionary.
+
+    Parameters
+    ----------
+    config: dict
+        The configuration dictionary containing experiment settings.
+    dataDict: dict
+        The HPO data dictionary ('train_fit_set' and 'val_data').
+    fitArgs: tuple, optional
+        The (image, feature) modalities of the searched scenario.
+
+    Returns
+    -------
+    trialCache: dict
+        The cache 'path', the 'split_fingerprint' and 'modality_fingerprint' of the
+        trials and the 'save_models' flag, or None if no cache path is configured.
+    """
+    cacheCfg = config["setup"]["trial_cache"]
+    if not cacheCfg["path"]:
+        return None
+    if "split_fingerprint" not in dataDict:
+        dataDict["split_fingerprint"] = getSplitFingerprint(
+            dataDict["train_fit_set"], dataDict["val_data"]
+        )
+    return {
+        "path": cacheCfg["path"],
+        "split_fingerprint": dataDict["split_fingerprint"],
+        "modality_fingerprint": getModalityFingerprint(*fitArgs),
+        "save_models": bool(cacheCfg["save_models"]),
+    }
+
+
+def getTrialKey(
+    cornacModel,
+    params: dict,
+    seed: int,
+    trialCache: dict,
+    earlyStopping: dict = None,
+    schedule: list = None,
+) -> str:
+    """
+    Get the cache key of a trial: its model class, hyperparameters, seed, split and
+    modalities (the scenario name is left out, so equal trials are shared by scenarios).
+
+    Parameters
+    ----------
+    cornacModel: class
+        The Cornac model class of the trial.
+    params: dict
+        The hyperparameters of the trial.
+    seed: int
+        The seed of the model.
+    trialCache: dict
+        The trial cache settings returned by 'getTrialCache'.
+    earlyStopping: dict, optional
+        The early stopping settings of the trial, if it is trained with early stopping.
+    schedule: list, optional
+        The epoch budgets a resumed trial was trained through (e.g., by successive halving).
+
+    Returns
+    -------
+    str
+        The SHA-1 hex digest of the trial.
+    """
+    identity = {
+        "version": TRIAL_CACHE_VERSION,
+        "class": f"{cornacModel.__module__}.{cornacModel.__name__}",
+        "params": params,
+        "seed": seed,
+        "split": trialCache["split_fingerprint"],
+        "modality": trialCache["modality_fingerprint"],
+    }
+    if earlyStopping:
+        identity["early_stopping"] = earlyStopping
+    if schedule:
+        identity["schedule"] = schedule
+    return hashlib.sha1(
+        json.dumps(identity, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def loadTrial(trialCache: dict, key: str) -> dict:
+    """
+    Load a completed trial from the cache.
+
+    Parameters
+    ----------
+    trialCache: dict
+        The trial cache settings returned by 'getTrialCache'.
+    key: str
+        The key of the trial (see 'getTrialKey').
+
+    Returns
+    -------
+    trial: dict
+        The cached 'metric' and (completed) 'params' of the trial, with its fitted 'model' if it was
+        saved and models are requested (otherwise None), or None if the trial is not cached.
+    """
+    trialPath = os.path.join(trialCache["path"], "trials", f"{key}.json")
+    if not os.path.exists(trialPath):
+        return None
+    with open(trialPath) as trialFile:
+        trial = json.load(trialFile)
+    trial["model"] = None
+    modelPath = trial.get("model_path")
+    if trialCache["save_models"] and modelPath:
+        modelPath = os.path.join(trialCache["path"], "models", modelPath)
+        if os.path.exists(os.path.join(modelPath, "meta.json")):
+            trial["model"], _ = loadModel(modelPath)
+    return trial
+
+
+def saveTrial(trialCache: dict, key: str, metric: float, params: dict, model=None):
+    """
+    Save a completed trial into the cache (with its fitted model if 'save_models' is set).
+    [Note]: the record is written atomically, so workers can share the same cache.
+
+    Parameters
+    ----------
+    trialCache: dict
+        The trial cache settings returned by 'getTrialCache'.
+    key: str
+        The key of the trial (see 'getTrialKey').
+    metric: float
+        The validation metric of the trial.
+    params: dict
+        The (completed) hyperparameters of the trial (e.g., with its best epochs).
+    model: cornac.models.Recommender, optional
+        The fitted model of the trial.
+    """
+    # Variables
+    trialsPath = os.path.join(trialCache["path"], "trials")
+    os.makedirs(trialsPath, exist_ok=True)
+    trial = {
+        "version": TRIAL_CACHE_VERSION,
+        "metric": float(metric),
+        "params": params,
+        "split_fingerprint": trialCache["split_fingerprint"],
+        "modality_fingerprint": trialCache["modality_fingerprint"],
+        "saved_at": datetime.now().isoformat(timespec="microseconds"),
+    }
+    # Save the fitted model first, so a cached record always finds it
+    if trialCache["save_models"] and model is not None:
+        modelPath = saveModel(
+            os.path.join(trialCache["path"], "models"),
+            (type(model).__name__, key),
+            model,
+            params,
+            trialCache["split_fingerprint"],
+            trialCache["modality_fingerprint"],
+        )
+        if modelPath is not None:
+            trial["model_path"] = os.path.basename(modelPath)
+    tmpName = f"{key}.json.{os.getpid()}.{threading.get_ident()}.tmp"
+    tmpPath = os.path.join(trialsPath, tmpName)
+    with open(tmpPath, "w") as trialFile:
+        json.dump(trial, trialFile, indent=2, default=str)
+    os.replace(tmpPath, os.path.join(trialsPath, f"{key}.json"))
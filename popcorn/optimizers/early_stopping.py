@@ -0,0 +1,146 @@
+import warnings
+import numpy as np
+from popcorn.optimizers.utils import fitModalities
+
+# Hyperparameters holding the epoch budget of the models (in lookup order)
+EPOCH_PARAMS = ["n_epochs", "max_iter"]
+# Models continuing from their learned parameters when fitted again
+RESUMABLE_MODELS = ["MF", "VBPR", "VMF", "AMR"]
+
+
+def getEarlyStopping(config: dict) -> dict:
+    """
+    Get the (checked) early stopping settings of the HPO trials, or None if disabled.
+
+    Parameters
+    ----------
+    config: dict
+        The configuration dictionary containing experiment settings.
+
+    Returns
+    -------
+    earlyStopping: dict
+        The 'chunk_epochs', 'patience' and 'min_delta' settings, or None.
+    """
+    esCfg = config["setup"]["early_stopping"]
+    if not esCfg["enabled"]:
+        return None
+    chunkEpochs, patience, minDelta = (
+        esCfg["chunk_epochs"],
+        esCfg["patience"],
+        esCfg["min_delta"],
+    )
+    if not isinstance(chunkEpochs, int) or chunkEpochs < 1:
+        print(f"- [Warning] Invalid early stopping chunk {chunkEpochs}. Using 1 epoch.")
+        chunkEpochs = 1
+    if not isinstance(patience, int) or patience < 1:
+        print(f"- [Warning] Invalid early stopping patience {patience}. Using 2 chunks.")
+        patience = 2
+    if not isinstance(minDelta, (int, float)) or minDelta < 0:
+        print(f"- [Warning] Invalid early stopping delta {minDelta}. Using 0.")
+        minDelta = 0.0
+    return {"chunk_epochs": chunkEpochs, "patience": patience, "min_delta": minDelta}
+
+
+def getEpochKey(cornacModel, params: dict) -> str:
+    """
+    Get the epoch hyperparameter of a trial, if its model can be trained in chunks.
+
+    Parameters
+    ----------
+    cornacModel: class
+        The Cornac model class of the trial.
+    params: dict
+        The hyperparameters of the trial.
+
+    Returns
+    -------
+    str
+        The name of the epoch hyperparameter, or None if the model cannot be resumed.
+    """
+    if cornacModel.__name__ not in RESUMABLE_MODELS:
+        return None
+    return next((key for key in EPOCH_PARAMS if key in params), None)
+
+
+def getLearnedArrays(model) -> dict:
+    """
+    Get a copy of the learned arrays of a fitted model (a best-epoch checkpoint).
+    """
+    return {
+        name: value.copy()
+        for name, value in vars(model).items()
+        if isinstance(value, np.ndarray) and value.ndim > 0 and value.dtype != object
+    }
+
+
+def fitWithEarlyStopping(
+    model,
+    epochKey: str,
+    maxEpochs: int,
+    trainFitSet,
+    evaluate,
+    fitArgs: tuple = (),
+    chunkEpochs: int = 1,
+    patience: int = 2,
+    minDelta: float = 0.0,
+) -> tuple:
+    """
+    Train a resumable model in chunks of epochs, scoring it on the validation users after
+    each chunk. Training stops once the metric has not improved (by more than 'minDelta')
+    for 'patience' chunks, and the model is restored to its best checkpoint.
+
+    Parameters
+    ----------
+    model: cornac.models.Recommender
+        The (unfitted) model to be trained.
+    epochKey: str
+        The name of the epoch hyperparameter of the model (e.g., 'n_epochs').
+    maxEpochs: int
+        The maximum number of epochs.
+    trainFitSet: Dataset
+        The training dataset used for fitting the model.
+    evaluate: callable
+        The function scoring the model on the validation users (e.g., the mean of
+        Recall and NDCG).
+    fitArgs: tuple, optional
+        The (image, feature) modalities passed to 'fitModalities'.
+    chunkEpochs: int, optional
+        The number of epochs trained between two evaluations (default is 1).
+    patience: int, optional
+        The number of chunks without improvement before stopping (default is 2).
+    minDelta: float, optional
+        The minimum increase of the metric counted as an improvement (default is 0).
+
+    Returns
+    -------
+    bestMetric: float
+        The validation metric of the best checkpoint.
+    bestEpochs: int
+        The number of epochs of the best checkpoint.
+    """
+    # Variables
+    maxEpochs = max(int(maxEpochs), 1)
+    bestMetric, bestEpochs, bestArrays = float("-inf"), 0, None
+    epochs, waited = 0, 0
+    # Train chunk by chunk (the model resumes from its learned parameters)
+    while epochs < maxEpochs:
+        chunk = min(chunkEpochs, maxEpochs - epochs)
+        setattr(model, epochKey, chunk)
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="Model is already fitted")
+            fitModalities(model, trainFitSet, *fitArgs)
+        epochs += chunk
+        metric = evaluate(model)
+        if bestArrays is None or metric > bestMetric + minDelta:
+            bestMetric, bestEpochs, bestArrays = metric, epochs, getLearnedArrays(model)
+            waited = 0
+            continue
+        waited += 1
+        if waited >= patience:
+            break
+    # Restore the best checkpoint
+    for name, value in bestArrays.items():
+        setattr(model, name, value)
+    setattr(model, epochKey, bestEpochs)
+    return bestMetric, bestEpochs
@@ -1,10 +1,115 @@
-import math
+import os
+import copy
 import time
 import inspect
 import numpy as np
+import pandas as pd
+import scipy.sparse
 from cornac.data import Dataset
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from popcorn.utils import shareArrays, attachArrays, releaseSharedArrays
 from popcorn.optimizers.utils import fitModalities
+from popcorn.optimizers.cache import getTrialCache, getTrialKey, loadTrial, saveTrial
+from popcorn.optimizers.telemetry import getTrialTelemetry, writeTrialRecord
+from popcorn.optimizers.early_stopping import (
+    getEpochKey,
+    getEarlyStopping,
+    fitWithEarlyStopping,
+)
+from popcorn.recommenders.ranking import getTopNMatrix, getUserIndices
+from popcorn.recommenders.metrics import buildGroundTruthMatrix, calculateRankingMetrics
+
+# Supported execution backends of the parallel grid search
+SUPPORTED_PARALLEL_BACKENDS = ["thread", "process"]
+# Worker-side grid search state (set by the pool initializer)
+_gridWorkerState = None
+
+
+def prepareValidation(
+    valGrp: dict, trainFitSet: Dataset, sampleSize: int = None, seed: int = 42
+) -> dict:
+    """
+    Prepare the validation users and their ground-truth matrix once for all HPO trials.
+    [Note]: only the validation users known to the training set can be ranked.
+
+    Parameters
+    ----------
+    valGrp: dict
+        A dictionary mapping user IDs to their ground truth items.
+    trainFitSet: Dataset
+        The training dataset used for fitting the models.
+    sampleSize: int, optional
+        The number of validation users to keep, sampled deterministically with the
+        seed (default is None, keeping all of them).
+    seed: int, optional
+        The seed of the user sample (default is 42).
+
+    Returns
+    -------
+    valData: dict
+        A dictionary with the validation 'user_ids', their 'user_idx' in the training
+        set and their binary 'gt_matrix'.
+    """
+    # Keep the validation users known to the training set
+    valUsers = [uid for uid in valGrp if uid in trainFitSet.uid_map]
+    if sampleSize and 0 < sampleSize < len(valUsers):
+        rng = np.random.default_rng(seed)
+        keep = np.sort(rng.choice(len(valUsers), sampleSize, replace=False))
+        valUsers = [valUsers[i] for i in keep]
+    # Build their ground-truth matrix
+    valDF = pd.DataFrame(
+        {
+            "user_id": [uid for uid in valUsers for _ in valGrp[uid]],
+            "item_id": [iid for uid in valUsers for iid in valGrp[uid]],
+        }
+    )
+    valData = {
+        "user_ids": valUsers,
+        "user_idx": getUserIndices(valUsers, trainFitSet.uid_map),
+        "gt_matrix": buildGroundTruthMatrix(valDF, valUsers, trainFitSet.iid_map),
+    }
+    return valData
+
+
+def evaluateValidation(
+    model,
+    valData: dict,
+    seenMatrix,
+    topN: int = 10,
+    blockSize: int = 512,
+    useGpu: bool = False,
+):
+    """
+    Rank all (prepared) validation users in blocks, masking their seen items,
+    and calculate their Recall and NDCG (with the ideal DCG cut at N).
+
+    Parameters
+    ----------
+    model: object
+        The fitted model to be evaluated.
+    valData: dict
+        The validation data prepared by 'prepareValidation'.
+    seenMatrix: scipy.sparse.csr_matrix
+        The (users x items) matrix of the training interactions.
+    topN: int, optional
+        The number of top items to consider for evaluation (default is 10).
+    blockSize: int, optional
+        The number of users ranked together in each block (default is 512).
+    useGpu: bool, optional
+        Flag indicating whether to rank on GPU using CuPy (default is False).
+
+    Returns
+    -------
+    recall: np.ndarray
+        The Recall@N of each validation user.
+    ndcg: np.ndarray
+        The NDCG@N of each validation user.
+    """
+    topIdx = getTopNMatrix(
+        model, valData["user_idx"], topN, seenMatrix, blockSize, useGpu
+    )
+    metrics = calculateRankingMetrics(topIdx, valData["gt_matrix"], idcgAtN=True)
+    return metrics["RC"], metrics["ND"]
 
 
 def gridMetric(
@@ -16,6 +121,8 @@ def gridMetric(
     allItemIds: list,
     useGpu: bool = False,
     topN=10,
+    valData: dict = None,
+    blockSize: int = 512,
 ):
     """
     Computes the grid search metric for hyperparameter optimization.
@@ -38,6 +145,11 @@ def gridMetric(
         Flag indicating whether to use GPU for hyperparameter optimization.
     topN: int, optional
         The number of top items to consider for evaluation (default is 10).
+    valData: dict, optional
+        The validation data prepared by 'prepareValidation' (default is preparing
+        it from 'valGrp' with all validation users).
+    blockSize: int, optional
+        The number of users ranked together in each block (default is 512).
 
     Returns
     -------
@@ -46,7 +158,6 @@ def gridMetric(
     """
     # Variables
     metric = 0.0
-    rec, ndcg = [], []
     cupyAvailable = False
     # Check if GPU is available for hyperparameter optimization
     if useGpu:
@@ -58,31 +169,305 @@ def gridMetric(
         except ImportError:
             print("- [Warning] CuPy not found! Using CPU for grid search ...")
             useGpu = False
-    # Loop through each user in the validation group
-    for uid, gt in valGrp.items():
-        if uid not in trainFitSet.uid_map:
-            continue
-        # Get user index
-        uidx = trainFitSet.uid_map[uid]
-        # Compute scores
-        scores = model.score(uidx)
-        if useGpu and cupyAvailable:
-            scores = cp.asarray(scores)
-        # Filter seen items
-        seen = trainSeen.get(uid, set())
-        # Set scores of seen items to negative infinity
-        cand = [(it, scores[itemIdMap[it]]) for it in allItemIds if it not in seen]
-        cand.sort(key=lambda x: float(x[1]), reverse=True)
-        # Get top-N recommendations
-        top = [c[0] for c in cand[:topN]]
-        # Compute metrics
-        rec.append(len(set(top) & set(gt)) / len(gt) if gt else 0)
-        dcg = sum(1 / math.log2(r + 2) for r, it in enumerate(top) if it in gt)
-        idcg = sum(1 / math.log2(r + 2) for r in range(min(len(gt), topN)))
-        ndcg.append(dcg / idcg if idcg else 0)
-        # Calculate metrics
-        metric = 0.5 * (np.mean(rec) + np.mean(ndcg))
+    if valData is None:
+        valData = prepareValidation(valGrp, trainFitSet)
+    if len(valData["user_idx"]) == 0:
         return metric
+    # Rank all validation users in blocks and calculate their metrics
+    rec, ndcg = evaluateValidation(
+        model,
+        valData,
+        trainFitSet.csr_matrix,
+        topN,
+        blockSize,
+        useGpu and cupyAvailable,
+    )
+    # Calculate metrics
+    metric = 0.5 * (np.mean(rec) + np.mean(ndcg))
+    return metric
+
+
+def fitAndScore(
+    cornacModel,
+    params: dict,
+    trainFitSet: Dataset,
+    valData: dict,
+    fitArgs: tuple = (),
+    seed: int = 42,
+    useGpu: bool = False,
+    blockSize: int = 512,
+    trialCache: dict = None,
+    earlyStopping: dict = None,
+    telemetry: dict = None,
+):
+    """
+    Fit a model with the given hyperparameters and score it on the validation users.
+    Trials found in the trial cache are returned without fitting (their model is None,
+    unless the cache keeps the fitted models). With early stopping, resumable models are
+    trained in chunks of epochs and their best epoch count replaces the grid value.
+
+    Parameters
+    ----------
+    cornacModel: class
+        The Cornac model class to be fitted.
+    params: dict
+        The hyperparameters of the trial.
+    trainFitSet: Dataset
+        The training dataset used for fitting the model.
+    valData: dict
+        The validation data prepared by 'prepareValidation'.
+    fitArgs: tuple, optional
+        The (image, feature) modalities passed to 'fitModalities'.
+    seed: int, optional
+        The seed of the model (default is 42).
+    useGpu: bool, optional
+        Flag indicating whether to use GPU (default is False).
+    blockSize: int, optional
+        The number of users ranked together in each block (default is 512).
+    trialCache: dict, optional
+        The trial cache settings returned by 'getTrialCache' (default is no cache).
+    earlyStopping: dict, optional
+        The early stopping settings returned by 'getEarlyStopping' (default is none).
+    telemetry: dict, optional
+        The trial telemetry returned by 'getTrialTelemetry' (default is no records).
+
+    Returns
+    -------
+    tuple
+        The validation metric, the fitted model and the (completed) hyperparameters.
+    """
+    # Make a copy of parameters
+    paramCopy = params.copy()
+    epochKey = getEpochKey(cornacModel, params) if earlyStopping else None
+    # Look up the trial cache
+    if trialCache is not None:
+        key = getTrialKey(
+            cornacModel, params, seed, trialCache, earlyStopping if epochKey else None
+        )
+        cached = loadTrial(trialCache, key)
+        if cached is not None:
+            print(f"-- Cached '{cached['params']}' to get {cached['metric']:.4f} ...")
+            if telemetry is not None:
+                writeTrialRecord(
+                    telemetry,
+                    {
+                        "params": cached["params"],
+                        "seed": seed,
+                        "metric": cached["metric"],
+                        "cached": True,
+                        "fit_s": 0.0,
+                        "eval_s": 0.0,
+                        "eval_users": 0,
+                        "users_per_s": None,
+                    },
+                )
+            return cached["metric"], cached["model"], cached["params"]
+    # Fit with modalities if needed
+    if useGpu and "use_gpu" in inspect.signature(cornacModel).parameters:
+        paramCopy["use_gpu"] = True
+    # Fit model
+    start = time.perf_counter()
+    evalTime, evalUsers = 0.0, 0
+    model = cornacModel(seed=seed, **paramCopy)
+
+    # Metric function (timed apart from the fit)
+    def evaluate(fittedModel) -> float:
+        nonlocal evalTime, evalUsers
+        evalStart = time.perf_counter()
+        metric = gridMetric(
+            fittedModel,
+            None,
+            trainFitSet,
+            None,
+            None,
+            None,
+            useGpu,
+            valData=valData,
+            blockSize=blockSize,
+        )
+        evalTime += time.perf_counter() - evalStart
+        evalUsers += len(valData["user_idx"])
+        return metric
+
+    if epochKey is not None:
+        # Train in chunks up to the grid epochs, keeping the best epoch
+        smetric, paramCopy[epochKey] = fitWithEarlyStopping(
+            model,
+            epochKey,
+            params[epochKey],
+            trainFitSet,
+            evaluate,
+            fitArgs,
+            earlyStopping["chunk_epochs"],
+            earlyStopping["patience"],
+            earlyStopping["min_delta"],
+        )
+    else:
+        # fitModalities expects (model, baseDataset, imgModality=None, featModality=None)
+        fitModalities(model, trainFitSet, *fitArgs)
+        # Compute metric
+        smetric = evaluate(model)
+    print(f"-- Fitting '{paramCopy}' to get {smetric:.4f} ...")
+    if telemetry is not None:
+        writeTrialRecord(
+            telemetry,
+            {
+                "params": paramCopy,
+                "seed": seed,
+                "metric": smetric,
+                "cached": False,
+                "fit_s": time.perf_counter() - start - evalTime,
+                "eval_s": evalTime,
+                "eval_users": evalUsers,
+                "users_per_s": evalUsers / evalTime if evalTime > 0 else None,
+            },
+        )
+    if trialCache is not None:
+        saveTrial(trialCache, key, smetric, paramCopy, model)
+    return smetric, model, paramCopy
+
+
+def getParallelSettings(config: dict) -> tuple:
+    """
+    Get the (checked) parallel settings of the HPO trials.
+
+    Parameters
+    ----------
+    config: dict
+        The configuration dictionary containing experiment settings.
+
+    Returns
+    -------
+    tuple
+        The parallel flag, the parallel backend and the number of workers.
+    """
+    parallelHPO = config["setup"]["use_parallel"]
+    backend = config["setup"]["parallel_backend"]
+    nWorkers = config["setup"]["hpo_workers"]
+    if backend not in SUPPORTED_PARALLEL_BACKENDS:
+        print(f"- [Warning] Unsupported parallel backend '{backend}'. Using 'thread'.")
+        backend = "thread"
+    if nWorkers is not None and isinstance(nWorkers, int) and nWorkers < 0:
+        nWorkers = os.cpu_count() or 1
+    if not isinstance(nWorkers, int) or nWorkers < 1:
+        print(f"- [Warning] Invalid number of HPO workers {nWorkers}. Using 8 workers.")
+        nWorkers = 8
+    return parallelHPO, backend, nWorkers
+
+
+def _indexModalities(fitArgsList: list) -> tuple:
+    """
+    Index the distinct modalities of several (image, feature) tuples, so each of them
+    is shared with the workers once and referred to by its position.
+    """
+    modalities, positions = [], {}
+    for fitArgs in fitArgsList:
+        for modality in fitArgs:
+            if modality is not None and id(modality) not in positions:
+                positions[id(modality)] = len(modalities)
+                modalities.append(modality)
+    indices = [
+        [None if m is None else positions[id(m)] for m in fitArgs]
+        for fitArgs in fitArgsList
+    ]
+    return modalities, indices
+
+
+def _shareGridData(trainFitSet: Dataset, valData: dict, fitArgs: tuple):
+    """
+    Publish the interaction arrays, validation data and modality features into shared memory.
+    The modalities are sent as shells without features, filled in by the workers.
+    [Note]: the validation data is optional (e.g., to refit the final models).
+    """
+    arrays = {f"uir.{k}": np.asarray(a) for k, a in zip("uir", trainFitSet.uir_tuple)}
+    if valData is not None:
+        arrays["val.user_idx"] = valData["user_idx"]
+        for key in ["data", "indices", "indptr"]:
+            arrays[f"val.gt.{key}"] = getattr(valData["gt_matrix"], key)
+    shells = []
+    for pos, modality in enumerate(fitArgs):
+        if modality is None:
+            shells.append(None)
+            continue
+        arrays[f"modality.{pos}"] = modality.features
+        shell = copy.copy(modality)
+        shell.features = None
+        shells.append(shell)
+    dataset = {
+        "num_users": trainFitSet.num_users,
+        "num_items": trainFitSet.num_items,
+        "uid_map": trainFitSet.uid_map,
+        "iid_map": trainFitSet.iid_map,
+        "seed": trainFitSet.seed,
+        "gt_shape": None if valData is None else valData["gt_matrix"].shape,
+    }
+    handles, specs = shareArrays(arrays)
+    return handles, specs, dataset, shells
+
+
+def _initGridWorker(
+    cornacModel, specs: dict, dataset: dict, shells: list, settings: dict
+):
+    """
+    Initialize a grid search worker by attaching the shared data.
+    [Note]: the views stay writable for Cornac's Cython kernels, which never write to them.
+    """
+    global _gridWorkerState
+    handles, arrays = attachArrays(specs, readOnly=False)
+    trainFitSet = Dataset(
+        dataset["num_users"],
+        dataset["num_items"],
+        dataset["uid_map"],
+        dataset["iid_map"],
+        (arrays["uir.u"], arrays["uir.i"], arrays["uir.r"]),
+        seed=dataset["seed"],
+    )
+    for pos, shell in enumerate(shells):
+        if shell is not None:
+            shell.features = arrays[f"modality.{pos}"]
+    valData = None
+    if dataset["gt_shape"] is not None:
+        valData = {
+            "user_idx": arrays["val.user_idx"],
+            "gt_matrix": scipy.sparse.csr_matrix(
+                (
+                    arrays["val.gt.data"],
+                    arrays["val.gt.indices"],
+                    arrays["val.gt.indptr"],
+                ),
+                shape=dataset["gt_shape"],
+                copy=False,
+            ),
+        }
+    _gridWorkerState = {
+        "model_class": cornacModel,
+        "train_fit_set": trainFitSet,
+        "val_data": valData,
+        "fit_args": tuple(shells),
+        "handles": handles,
+        **settings,
+    }
+
+
+def _gridTrialTask(params: dict):
+    """
+    Run one grid search trial in a worker process, returning only its metric and parameters.
+    """
+    state = _gridWorkerState
+    smetric, _, paramCopy = fitAndScore(
+        state["model_class"],
+        params,
+        state["train_fit_set"],
+        state["val_data"],
+        state["fit_args"],
+        state["seed"],
+        state["use_gpu"],
+        state["block_size"],
+        state["trial_cache"],
+        state["early_stopping"],
+        state["telemetry"],
+    )
+    return smetric, None, paramCopy
 
 
 def grid(
@@ -90,6 +475,9 @@ def grid(
 ) -> dict:
     """
     Performs hyperparameter optimization (HPO) using grid search for a given model class.
+    In the 'process' parallel backend, the interactions, validation data and modality
+    features are published once into shared memory and only the trial metrics and
+    parameters come back from the workers.
 
     Parameters
     ----------
@@ -108,47 +496,74 @@ def grid(
 
     Returns
     -------
+    bestModel: object
+        The best model (fitted in the 'thread' backend, unfitted in the 'process' one).
+    bestParams: dict
+        The hyperparameters of the best model.
     """
     # Variables
     start = time.time()
     config = dataDict["config"]
     valGrp = dataDict["val_grp"]
-    itemIdMap = dataDict["iid_map"]
-    allItemIds = dataDict["all_iids"]
-    trainSeen = dataDict["train_seen"]
     trainFitSet = dataDict["train_fit_set"]
+    valData = dataDict.get("val_data")
+    if valData is None:
+        valData = prepareValidation(valGrp, trainFitSet)
     # Config Variables
     seed = config["setup"]["seed"]
     useGPU = config["setup"]["use_gpu"]
-    parallelHPO = config["setup"]["use_parallel"]
+    blockSize = config["recommender"]["batch_size"]
+    parallelHPO, backend, nWorkers = getParallelSettings(config)
     print(
         f"- Starting GridSearch procedure (seed: {seed}, useGPU: {useGPU}, parallelHPO: {parallelHPO})..."
     )
 
+    trialCache = getTrialCache(config, dataDict, fit_args)
+    earlyStopping = getEarlyStopping(config)
+    telemetry = getTrialTelemetry(dataDict, name, scenario)
+
     # Evaluation function
     def gridEvalCalculator(params: dict):
-        # Make a copy of parameters
-        paramCopy = params.copy()
-        # Fit with modalities if needed
-        if useGPU and "use_gpu" in inspect.signature(cornacModel).parameters:
-            paramCopy["use_gpu"] = True
-        # Fit model
-        model = cornacModel(seed=seed, **paramCopy)
-        # fitModalities expects (model, baseDataset, imgModality=None, featModality=None)
-        fitModalities(model, trainFitSet, *fit_args)
-        # Compute metric
-        smetric = gridMetric(
-            model, valGrp, trainFitSet, trainSeen, itemIdMap, allItemIds, useGPU
+        return fitAndScore(
+            cornacModel,
+            params,
+            trainFitSet,
+            valData,
+            fit_args,
+            seed,
+            useGPU,
+            blockSize,
+            trialCache,
+            earlyStopping,
+            telemetry,
         )
-        print(f"-- Fitting '{paramCopy}' to get {smetric:.4f} ...")
-        return smetric, model, paramCopy
 
     # Perform grid search
     print(
         f"-- HPO '{name}' in scenario '{scenario}' with {len(paramGrid)} param sets..."
     )
-    if parallelHPO and len(paramGrid) > 1:
-        with ThreadPoolExecutor(max_workers=min(8, len(paramGrid))) as ex:
+    nWorkers = min(nWorkers, len(paramGrid))
+    if parallelHPO and nWorkers > 1 and backend == "process":
+        handles, specs, dataset, shells = _shareGridData(trainFitSet, valData, fit_args)
+        settings = {
+            "seed": seed,
+            "use_gpu": useGPU,
+            "block_size": blockSize,
+            "trial_cache": trialCache,
+            "early_stopping": earlyStopping,
+            "telemetry": telemetry,
+        }
+        try:
+            with ProcessPoolExecutor(
+                max_workers=nWorkers,
+                initializer=_initGridWorker,
+                initargs=(cornacModel, specs, dataset, shells, settings),
+            ) as ex:
+                results = list(ex.map(_gridTrialTask, paramGrid))
+        finally:
+            releaseSharedArrays(handles)
+    elif parallelHPO and nWorkers > 1:
+        with ThreadPoolExecutor(max_workers=nWorkers) as ex:
             results = list(ex.map(gridEvalCalculator, paramGrid))
     else:
         results = [gridEvalCalculator(p) for p in paramGrid]
@@ -157,4 +572,6 @@ def grid(
     print(
         f"-- Found the best case: '{name}' in '{scenario}', item '{best[2]}' ({best[0]:.4f}), done in {time.time()-start:.1f}s."
     )
-    return best[1], best[2]
+    # Only the parameters of the best trial come back from the worker processes
+    bestModel = best[1] if best[1] is not None else cornacModel(seed=seed, **best[2])
+    return bestModel, best[2]
@@ -2,7 +2,9 @@ import scipy.sparse
 import pandas as pd
 from cornac.data import Dataset
 from sklearn.model_selection import train_test_split
-from popcorn.optimizers.parameters import getParametersGrid
+from popcorn.optimizers.grid import prepareValidation
+from popcorn.optimizers.telemetry import initTelemetry, summarizeTelemetry
+from popcorn.optimizers.parameters import getParametersGrid, getParametersSpace
 from popcorn.optimizers.hpo import applyHyperparameterOptimization, refitBestModels
 
 
@@ -37,6 +39,8 @@ def gridSearch(
     MODEL_CHOICE = config["setup"]["model_choice"]
     testRatio = config["setup"]["split"]["test_ratio"]
     isFastPrtye = config["setup"]["is_fast_prototype"]
+    valUsers = config["setup"]["hpo_val_users"]
+    hpoMethod = config["setup"]["hpo_method"]
     # Check arguments
     if trainDF is None:
         print("- [Error] Training DataFrame is missing. Exiting grid search ...")
@@ -61,7 +65,15 @@ def gridSearch(
         trainFitDF[["user_id", "item_id", "rating"]].values.tolist()
     )
     allItemIds, itemIdMap = trainFitSet.item_ids, trainFitSet.iid_map
-    print(f"- Training and validation sets prepared!")
+    if valUsers is not None and (not isinstance(valUsers, int) or valUsers < 0):
+        print(
+            f"- [Warning] Invalid number of validation users {valUsers}. Using all of them."
+        )
+        valUsers = 0
+    valData = prepareValidation(valGrp, trainFitSet, valUsers, seed)
+    print(
+        f"- Training and validation sets prepared ({len(valData['user_ids']):,} validation users)!"
+    )
     # Keep them in a dictionary
     dataDict = {
         "val_grp": valGrp,
@@ -69,6 +81,8 @@ def gridSearch(
         "iid_map": itemIdMap,
         "all_iids": allItemIds,
         "train_fit_set": trainFitSet,
+        "val_data": valData,
+        "telemetry": initTelemetry(config),
         "config": config,
     }
     # Get parameter grid
@@ -77,7 +91,13 @@ def gridSearch(
             f"- [Warning] Invalid number of epochs {N_EPOCHS}. Using default of 10 epochs."
         )
         N_EPOCHS = 10
-    parametersGrid = getParametersGrid(isFastPrtye, N_EPOCHS)
+    # (successive halving prunes the weak param sets early, so it searches the full grids)
+    # (the TPE search samples continuous search spaces instead)
+    maxConfigs = None if hpoMethod == "halving" else 5
+    if hpoMethod == "tpe":
+        parametersGrid = getParametersSpace(isFastPrtye, N_EPOCHS)
+    else:
+        parametersGrid = getParametersGrid(isFastPrtye, N_EPOCHS, maxConfigs)
     # Apply HPO for the models
     modelsCfg = applyHyperparameterOptimization(
         MODEL_CHOICE, parametersGrid, dataDict, modalitiesDict
@@ -86,5 +106,6 @@ def gridSearch(
     finalModels = refitBestModels(
         trainSet, modalitiesDict, modelsCfg, MODEL_CHOICE, config
     )
+    summarizeTelemetry(dataDict["telemetry"])
     print(f"- Grid search done! Kept {len(finalModels)} final models.")
     return finalModels
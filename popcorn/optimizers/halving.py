@@ -0,0 +1,297 @@
+import time
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from popcorn.optimizers.utils import fitModalities
+from popcorn.optimizers.cache import getTrialCache, getTrialKey, loadTrial, saveTrial
+from popcorn.optimizers.telemetry import getTrialTelemetry, writeTrialRecord
+from popcorn.optimizers.early_stopping import EPOCH_PARAMS, RESUMABLE_MODELS
+from popcorn.optimizers.grid import (
+    grid,
+    gridMetric,
+    prepareValidation,
+    getParallelSettings,
+)
+
+
+def advanceTrial(
+    trial: dict,
+    budget: int,
+    cornacModel,
+    name: str,
+    trainFitSet,
+    valData: dict,
+    fitArgs: tuple = (),
+    seed: int = 42,
+    useGpu: bool = False,
+    blockSize: int = 512,
+    trialCache: dict = None,
+    telemetry: dict = None,
+) -> dict:
+    """
+    Train a successive-halving trial up to the given epoch budget and score it.
+    Resumable models continue from their learned parameters, others restart.
+    Each rung is looked up in (and saved to) the trial cache; restarted trials share
+    the keys of the grid search trials, resumed ones are also keyed by their schedule.
+    Each rung is also recorded in the trial telemetry.
+
+    Parameters
+    ----------
+    trial: dict
+        The trial state ('params', 'epoch_key', 'max_epochs', 'epochs', 'schedule',
+        'model', 'metric').
+    budget: int
+        The number of epochs the trial should have been trained for.
+    cornacModel: class
+        The Cornac model class of the trial.
+    name: str
+        The name of the model (e.g., 'VBPR').
+    trainFitSet: Dataset
+        The training dataset used for fitting the model.
+    valData: dict
+        The validation data prepared by 'prepareValidation'.
+    fitArgs: tuple, optional
+        The (image, feature) modalities passed to 'fitModalities'.
+    seed: int, optional
+        The seed of the model (default is 42).
+    useGpu: bool, optional
+        Flag indicating whether to use GPU (default is False).
+    blockSize: int, optional
+        The number of users ranked together in each block (default is 512).
+    trialCache: dict, optional
+        The trial cache settings returned by 'getTrialCache' (default is no cache).
+    telemetry: dict, optional
+        The trial telemetry returned by 'getTrialTelemetry' (default is no records).
+
+    Returns
+    -------
+    trial: dict
+        The updated trial state.
+    """
+    # Variables
+    target = min(budget, trial["max_epochs"])
+    if target <= trial["epochs"]:
+        return trial
+    rungParams = {**trial["params"], trial["epoch_key"]: target}
+    # A resumable trial may continue its schedule, any trial may restart for the target
+    schedules = [[target]]
+    if name in RESUMABLE_MODELS and trial["schedule"]:
+        schedules.insert(0, trial["schedule"] + [target])
+    resume = trial["model"] is not None and len(schedules) > 1
+    schedule = schedules[0] if resume else [target]
+
+    # Cache key of the rung (restarted trials share the keys of the grid search)
+    def rungKey(rungSchedule: list) -> str:
+        return getTrialKey(
+            cornacModel,
+            rungParams,
+            seed,
+            trialCache,
+            schedule=rungSchedule if len(rungSchedule) > 1 else None,
+        )
+
+    # Look up the trial cache (without a cached model, the next rung restarts)
+    if trialCache is not None:
+        for rungSchedule in schedules:
+            cached = loadTrial(trialCache, rungKey(rungSchedule))
+            if cached is None:
+                continue
+            trial["model"], trial["metric"] = cached["model"], cached["metric"]
+            trial["epochs"], trial["schedule"] = target, rungSchedule
+            print(
+                f"-- Cached '{trial['params']}' for {target} epochs to get {trial['metric']:.4f} ..."
+            )
+            if telemetry is not None:
+                writeTrialRecord(
+                    telemetry,
+                    {
+                        "params": rungParams,
+                        "seed": seed,
+                        "metric": trial["metric"],
+                        "cached": True,
+                        "fit_s": 0.0,
+                        "eval_s": 0.0,
+                        "eval_users": 0,
+                        "users_per_s": None,
+                        "schedule": rungSchedule,
+                    },
+                )
+            return trial
+    # Continue the fitted model for the missing epochs, or (re)start it
+    start = time.perf_counter()
+    if resume:
+        model = trial["model"]
+        setattr(model, trial["epoch_key"], target - trial["epochs"])
+    else:
+        params = rungParams.copy()
+        if useGpu and "use_gpu" in inspect.signature(cornacModel).parameters:
+            params["use_gpu"] = True
+        model = cornacModel(seed=seed, **params)
+    fitModalities(model, trainFitSet, *fitArgs)
+    setattr(model, trial["epoch_key"], target)
+    trial["model"], trial["epochs"], trial["schedule"] = model, target, schedule
+    # Score the trial at its current budget
+    fitTime = time.perf_counter() - start
+    evalStart = time.perf_counter()
+    trial["metric"] = gridMetric(
+        model,
+        None,
+        trainFitSet,
+        None,
+        None,
+        None,
+        useGpu,
+        valData=valData,
+        blockSize=blockSize,
+    )
+    evalTime = time.perf_counter() - evalStart
+    evalUsers = len(valData["user_idx"])
+    print(
+        f"-- Trained '{trial['params']}' for {target} epochs to get {trial['metric']:.4f} ..."
+    )
+    if telemetry is not None:
+        writeTrialRecord(
+            telemetry,
+            {
+                "params": rungParams,
+                "seed": seed,
+                "metric": trial["metric"],
+                "cached": False,
+                "fit_s": fitTime,
+                "eval_s": evalTime,
+                "eval_users": evalUsers,
+                "users_per_s": evalUsers / evalTime if evalTime > 0 else None,
+                "schedule": schedule,
+            },
+        )
+    if trialCache is not None:
+        saveTrial(trialCache, rungKey(schedule), trial["metric"], rungParams, model)
+    return trial
+
+
+def successiveHalving(
+    dataDict: dict, cornacModel, name: str, scenario: str, paramGrid: dict, *fit_args
+) -> dict:
+    """
+    Performs hyperparameter optimization (HPO) using successive halving for a given model class.
+    All configurations start with a small epoch budget; after each rung, only the best
+    1/eta of them keep training (for eta times more epochs) until the full budget.
+    Models without an epoch budget fall back to the plain grid search.
+    [Note]: the rungs are trained with threads; the 'process' backend is not used.
+
+    Parameters
+    ----------
+    dataDict: dict
+        A dictionary containing the data to be used for hyperparameter optimization.
+    cornacModel: class
+        The Cornac model class for which to perform hyperparameter optimization.
+    name: str
+        The name of the model being optimized.
+    scenario: str
+        The scenario or modality for which the model is being optimized.
+    paramGrid: dict
+        A dictionary containing the hyperparameter grid to search over.
+    fit_args: tuple
+        Additional arguments to be passed to the model fitting function.
+
+    Returns
+    -------
+    bestModel: object
+        The best model, trained for its full epoch budget.
+    bestParams: dict
+        The hyperparameters of the best model.
+    """
+    # Variables
+    start = time.time()
+    config = dataDict["config"]
+    trainFitSet = dataDict["train_fit_set"]
+    valData = dataDict.get("val_data")
+    if valData is None:
+        valData = prepareValidation(dataDict["val_grp"], trainFitSet)
+    # Config Variables
+    seed = config["setup"]["seed"]
+    useGPU = config["setup"]["use_gpu"]
+    parallelHPO, backend, nWorkers = getParallelSettings(config)
+    blockSize = config["recommender"]["batch_size"]
+    minEpochs = config["setup"]["halving"]["min_epochs"]
+    eta = config["setup"]["halving"]["eta"]
+    # Check the arguments
+    epochKey = next((k for k in EPOCH_PARAMS if paramGrid and k in paramGrid[0]), None)
+    if epochKey is None or len(paramGrid) < 2:
+        return grid(dataDict, cornacModel, name, scenario, paramGrid, *fit_args)
+    if not isinstance(minEpochs, int) or minEpochs < 1:
+        print(f"- [Warning] Invalid minimum epochs {minEpochs}. Using 1 epoch.")
+        minEpochs = 1
+    if not isinstance(eta, int) or eta < 2:
+        print(f"- [Warning] Invalid halving rate {eta}. Using 3.")
+        eta = 3
+    if parallelHPO and backend == "process":
+        print(
+            "- [Warning] Successive halving resumes the models in memory. Using 'thread'."
+        )
+    trialCache = getTrialCache(config, dataDict, fit_args)
+    telemetry = getTrialTelemetry(dataDict, name, scenario)
+    # Prepare the trials
+    trials = [
+        {
+            "params": params,
+            "epoch_key": epochKey,
+            "max_epochs": params.get(epochKey, 1),
+            "epochs": 0,
+            "schedule": [],
+            "model": None,
+            "metric": float("-inf"),
+        }
+        for params in paramGrid
+    ]
+    maxEpochs = max(trial["max_epochs"] for trial in trials)
+    budget = min(minEpochs, maxEpochs)
+    print(
+        f"-- Successive halving '{name}' in scenario '{scenario}' with {len(trials)} param sets (eta: {eta}, epochs: {budget} to {maxEpochs}) ..."
+    )
+
+    # Advancing function
+    def advance(trial: dict):
+        return advanceTrial(
+            trial,
+            budget,
+            cornacModel,
+            name,
+            trainFitSet,
+            valData,
+            fit_args,
+            seed,
+            useGPU,
+            blockSize,
+            trialCache,
+            telemetry,
+        )
+
+    # Train the surviving trials rung by rung
+    survivors = trials
+    while True:
+        print(f"-- Rung: {len(survivors)} param sets trained up to {budget} epochs ...")
+        if parallelHPO and len(survivors) > 1:
+            with ThreadPoolExecutor(max_workers=min(nWorkers, len(survivors))) as ex:
+                survivors = list(ex.map(advance, survivors))
+        else:
+            survivors = [advance(trial) for trial in survivors]
+        survivors.sort(key=lambda x: x["metric"], reverse=True)
+        if budget >= maxEpochs or len(survivors) == 1:
+            break
+        # Keep the best fraction and release the others
+        for trial in survivors[max(1, len(survivors) // eta) :]:
+            trial["model"] = None
+        survivors = survivors[: max(1, len(survivors) // eta)]
+        budget = min(budget * eta, maxEpochs)
+    # Make sure the winner is trained for its full budget
+    budget = maxEpochs
+    best = advance(survivors[0])
+    print(
+        f"-- Found the best case: '{name}' in '{scenario}', item '{best['params']}' ({best['metric']:.4f}), done in {time.time()-start:.1f}s."
+    )
+    # Cached winners come without their model unless the cache keeps the fitted models
+    bestModel = best["model"]
+    if bestModel is None:
+        bestParams = {**best["params"], epochKey: best["epochs"]}
+        bestModel = cornacModel(seed=seed, **bestParams)
+    return bestModel, best["params"]
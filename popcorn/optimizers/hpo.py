@@ -1,8 +1,32 @@
 import inspect
 import pandas as pd
-from popcorn.optimizers.grid import grid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from popcorn.utils import releaseSharedArrays
+from popcorn.optimizers.grid import (
+    grid,
+    getParallelSettings,
+    _shareGridData,
+    _initGridWorker,
+    _indexModalities,
+)
+import popcorn.optimizers.grid as gridModule
+from popcorn.optimizers.tpe import tpeSearch
+from popcorn.optimizers.halving import successiveHalving
+from popcorn.optimizers.scheduler import scheduleTrials
 from cornac.models import MF, VBPR, VMF, AMR, VAECF, MostPop
-from popcorn.optimizers.utils import modelSelected, fitModalities
+from popcorn.optimizers.utils import modelSelected, fitModalities, getDatasetView
+from popcorn.recommenders.registry import (
+    saveModel,
+    getDataFingerprint,
+    getModalityFingerprint,
+)
+
+# Supported HPO methods (all sharing the signature of 'grid')
+SUPPORTED_HPO_METHODS = {
+    "grid": grid,
+    "halving": successiveHalving,
+    "tpe": tpeSearch,
+}
 
 
 def applyHyperparameterOptimization(
@@ -30,6 +54,11 @@ def applyHyperparameterOptimization(
     # Variables
     modelsCfg = {}
     config = dataDict["config"]
+    hpoMethod = config["setup"]["hpo_method"]
+    if hpoMethod not in SUPPORTED_HPO_METHODS:
+        print(f"- [Warn] Unsupported HPO method '{hpoMethod}'! Using 'grid' ...")
+        hpoMethod = "grid"
+    search = SUPPORTED_HPO_METHODS[hpoMethod]
     # Get the requested modalities
     modalities = []
     for item in config["modalities"]["selected"]:
@@ -39,87 +68,110 @@ def applyHyperparameterOptimization(
             modalities.append("audio")
         elif item.startswith("text"):
             modalities.append("text")
-    print("- Starting HPO ...")
+    # Collect the scenarios (model, modality or fusion variant) to be optimized
+    scenarios = []
+
+    def addScenario(tag: str, cornacModel, name: str, scenario: str, *fitArgs):
+        scenarios.append(
+            {
+                "tag": tag,
+                "model_class": cornacModel,
+                "name": name,
+                "scenario": scenario,
+                "grid": parametersGrid[name],
+                "fit_args": fitArgs,
+            }
+        )
+
     # MF
     if modelSelected("MF", model):
-        modelsCfg["MF"] = grid(dataDict, MF, "MF", "(na)", parametersGrid["MF"])
+        addScenario("MF", MF, "MF", "(na)")
     # VAECF
     if modelSelected("VAECF", model):
-        modelsCfg["VAECF"] = grid(
-            dataDict, VAECF, "VAECF", "(na)", parametersGrid["VAECF"]
-        )
+        addScenario("VAECF", VAECF, "VAECF", "(na)")
     # VBPR
     if modelSelected("VBPR", model):
         for mod in modalities:
-            modelsCfg[f"VBPR_{mod}"] = grid(
-                dataDict,
+            addScenario(
+                f"VBPR_{mod}",
                 VBPR,
                 "VBPR",
                 mod,
-                parametersGrid["VBPR"],
                 modalitiesDict["concat"][f"{mod}_image"],
             )
         for mv in modalitiesDict:
             if mv == "concat":
                 continue
-            modelsCfg[f"VBPR_{mv}"] = grid(
-                dataDict,
-                VBPR,
-                "VBPR",
-                mv,
-                parametersGrid["VBPR"],
-                modalitiesDict[mv]["all_image"],
-            )
+            addScenario(f"VBPR_{mv}", VBPR, "VBPR", mv, modalitiesDict[mv]["all_image"])
     # VMF
     if modelSelected("VMF", model):
         for mod in modalities:
-            modelsCfg[f"VMF_{mod}"] = grid(
-                dataDict,
+            addScenario(
+                f"VMF_{mod}",
                 VMF,
                 "VMF",
                 mod,
-                parametersGrid["VMF"],
                 modalitiesDict["concat"][f"{mod}_image"],
             )
         for mv in modalitiesDict:
             if mv == "concat":
                 continue
-            modelsCfg[f"VMF_{mv}"] = grid(
-                dataDict,
-                VMF,
-                "VMF",
-                mv,
-                parametersGrid["VMF"],
-                modalitiesDict[mv]["all_image"],
-            )
+            addScenario(f"VMF_{mv}", VMF, "VMF", mv, modalitiesDict[mv]["all_image"])
     # AMR
     if modelSelected("AMR", model):
         for mod in modalities:
-            modelsCfg[f"AMR_{mod}"] = grid(
-                dataDict,
+            addScenario(
+                f"AMR_{mod}",
                 AMR,
                 "AMR",
                 mod,
-                parametersGrid["AMR"],
                 modalitiesDict["concat"][f"{mod}_image"],
                 modalitiesDict["concat"]["all_feature"],
             )
         for mv in modalitiesDict:
             if mv == "concat":
                 continue
-            modelsCfg[f"AMR_{mv}"] = grid(
-                dataDict,
+            addScenario(
+                f"AMR_{mv}",
                 AMR,
                 "AMR",
                 mv,
-                parametersGrid["AMR"],
                 modalitiesDict[mv]["all_image"],
                 modalitiesDict[mv]["all_feature"],
             )
+    print("- Starting HPO ...")
+    # The grid search trials of all scenarios can share a single worker pool
+    if hpoMethod == "grid" and config["setup"]["hpo_job_graph"]:
+        modelsCfg = scheduleTrials(dataDict, scenarios)
+    else:
+        for scn in scenarios:
+            modelsCfg[scn["tag"]] = search(
+                dataDict,
+                scn["model_class"],
+                scn["name"],
+                scn["scenario"],
+                scn["grid"],
+                *scn["fit_args"],
+            )
     print(f"- HPO done! Kept {len(modelsCfg)} configs.")
     return modelsCfg
 
 
+def _refitTask(job: dict):
+    """
+    Refit one final model in a worker process (its modalities are picked from the shared
+    ones), returning it without its datasets.
+    """
+    state = gridModule._gridWorkerState
+    model = job["model_class"](**job["init_args"])
+    fitArgs = [None if p is None else state["fit_args"][p] for p in job["modalities"]]
+    fitModalities(model, state["train_fit_set"], *fitArgs)
+    for name in getattr(model, "ignored_attrs", ["train_set", "val_set", "test_set"]):
+        if name in vars(model):
+            setattr(model, name, None)
+    return model
+
+
 def refitBestModels(
     trainSet: pd.DataFrame,
     modalitiesDict: dict,
@@ -129,6 +181,9 @@ def refitBestModels(
 ) -> dict:
     """
     Re-fits the best models on the full training set after hyperparameter optimization.
+    The refits are independent, so they run on the parallel HPO backend (in the 'process'
+    one, the training data and modalities are shared once with the workers).
+    If a registry path is configured, each final model is also saved into the registry.
 
     Parameters
     ----------
@@ -147,6 +202,9 @@ def refitBestModels(
     finalModels = {}
     seed = cfg["setup"]["seed"]
     useGpu = cfg["setup"]["use_gpu"]
+    registryPath = cfg["recommender"]["registry_path"]
+    parallelHPO, backend, nWorkers = getParallelSettings(cfg)
+    dataFingerprint = getDataFingerprint(trainSet) if registryPath else None
     # Get the requested modalities
     modalities = []
     for item in cfg["modalities"]["selected"]:
@@ -156,29 +214,90 @@ def refitBestModels(
             modalities.append("audio")
         elif item.startswith("text"):
             modalities.append("text")
-    # Re-fit models
+    # Collect the refit jobs
+    jobs = []
     if modelSelected("TopPop", modelChoice):
-        mpop = MostPop()
-        mpop.fit(trainSet)
-        finalModels[("TopPop", "NA")] = mpop
-    for tag, (bestModel, cfg) in modelsCfg.items():
+        jobs.append(
+            {
+                "key": ("TopPop", "NA"),
+                "model_class": MostPop,
+                "params": {},
+                "init_args": {},
+                "fit_args": (),
+            }
+        )
+    for tag, (bestModel, params) in modelsCfg.items():
         model, variant = tag.split("_", 1) if "_" in tag else (tag, "NA")
         extras = {}
         if useGpu and "use_gpu" in inspect.signature(bestModel.__class__).parameters:
             extras["use_gpu"] = True
         if model in {"MF", "VAECF"}:
-            new = bestModel.__class__(seed=seed, **cfg, **extras)
-            fitModalities(new, trainSet)
-            finalModels[(model, variant)] = new
+            img, feat = None, None
+        elif variant in modalities:
+            img = modalitiesDict["concat"][f"{variant}_image"]
+            feat = None
         else:
-            if variant in modalities:
-                img = modalitiesDict["concat"][f"{variant}_image"]
-                feat = None
-            else:
-                img = modalitiesDict[variant]["all_image"]
-                feat = modalitiesDict[variant].get("all_feature")
-            new = bestModel.__class__(seed=seed, **cfg, **extras)
-            fitModalities(new, trainSet, img, feat)
-            finalModels[(model, variant)] = new
-    print(f"- Re-fit finished for '{model}' with variant '{variant}'.")
+            img = modalitiesDict[variant]["all_image"]
+            feat = modalitiesDict[variant].get("all_feature")
+        jobs.append(
+            {
+                "key": (model, variant),
+                "model_class": bestModel.__class__,
+                "params": params,
+                "init_args": {"seed": seed, **params, **extras},
+                "fit_args": (img, feat),
+            }
+        )
+    nWorkers = max(1, min(nWorkers, len(jobs))) if parallelHPO else 1
+
+    # Refitting function
+    def refit(job: dict):
+        new = job["model_class"](**job["init_args"])
+        fitModalities(new, trainSet, *job["fit_args"])
+        return new
+
+    # Re-fit models
+    print(f"- Re-fitting {len(jobs)} final models on {nWorkers} workers ...")
+    if nWorkers > 1 and backend == "process":
+        shared, indices = _indexModalities([job["fit_args"] for job in jobs])
+        handles, specs, dataset, shells = _shareGridData(trainSet, None, tuple(shared))
+        settings = {"seed": seed, "use_gpu": useGpu}
+        processJobs = [
+            {
+                "model_class": job["model_class"],
+                "init_args": job["init_args"],
+                "modalities": idx,
+            }
+            for job, idx in zip(jobs, indices)
+        ]
+        try:
+            with ProcessPoolExecutor(
+                max_workers=nWorkers,
+                initializer=_initGridWorker,
+                initargs=(None, specs, dataset, shells, settings),
+            ) as ex:
+                refitted = list(ex.map(_refitTask, processJobs))
+        finally:
+            releaseSharedArrays(handles)
+        # Attach the training data back, as fitted in the parent
+        for job, new in zip(jobs, refitted):
+            new.train_set = getDatasetView(trainSet, *job["fit_args"])
+    elif nWorkers > 1:
+        with ThreadPoolExecutor(max_workers=nWorkers) as ex:
+            refitted = list(ex.map(refit, jobs))
+    else:
+        refitted = [refit(job) for job in jobs]
+    for job, new in zip(jobs, refitted):
+        finalModels[job["key"]] = new
+        print(f"- Re-fit finished for '{job['key'][0]}' with variant '{job['key'][1]}'.")
+        # Save the final model with its hyper-parameters and fingerprints
+        if registryPath:
+            saveModel(
+                registryPath,
+                job["key"],
+                new,
+                job["params"],
+                dataFingerprint,
+                getModalityFingerprint(*job["fit_args"]),
+            )
     return finalModels
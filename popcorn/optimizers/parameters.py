@@ -1,4 +1,4 @@
-def getParametersGrid(isFastPrtye: bool = True, nEpochs: int = 10):
+def getParametersGrid(isFastPrtye: bool = True, nEpochs: int = 10, maxConfigs: int = 5):
     """
     Get the parameter grid for different optimizers.
 
@@ -8,6 +8,8 @@ def getParametersGrid(isFastPrtye: bool = True, nEpochs: int = 10):
         Flag to indicate if a fast prototype is being used. Default is True.
     nEpochs: int, optional
         The number of epochs to use for training. Default is 10.
+    maxConfigs: int, optional
+        The maximum number of configurations per model (None keeps all). Default is 5.
 
     Returns
     -------
@@ -22,12 +24,12 @@ def getParametersGrid(isFastPrtye: bool = True, nEpochs: int = 10):
         {"k": k, "learning_rate": lr, "lambda_reg": 0.01, "max_iter": 50}
         for k in (32, 64, 128)
         for lr in (0.01, 0.005)
-    ][0:5]
+    ][:maxConfigs]
     GR_VAECF = [
         {"k": k, "learning_rate": lr, "beta": 0.01}
         for k in (32, 64, 128)
         for lr in (0.001, 0.0005)
-    ][0:5]
+    ][:maxConfigs]
     if isFastPrtye:
         GR_VBPR = [
             {
@@ -41,7 +43,7 @@ def getParametersGrid(isFastPrtye: bool = True, nEpochs: int = 10):
             for k in (32, 64, 128)
             for k2 in (8, 16)
             for lr in (0.001,)
-        ][0:5]
+        ][:maxConfigs]
     else:
         GR_VBPR = [
             {
@@ -55,33 +57,33 @@ def getParametersGrid(isFastPrtye: bool = True, nEpochs: int = 10):
             for k in (32, 64, 128)
             for k2 in (8, 16)
             for lr in (0.001,)
-        ][0:5]
+        ][:maxConfigs]
     if isFastPrtye:
         GR_VMF = [
             {"k": k, "learning_rate": lr, "n_epochs": 1}
             for k in (32, 64, 128)
             for lr in (0.01,)
-        ][0:5]
+        ][:maxConfigs]
     else:
         GR_VMF = [
             {"k": k, "learning_rate": lr, "n_epochs": nEpochs}
             for k in (32, 64, 128)
             for lr in (0.01,)
-        ][0:5]
+        ][:maxConfigs]
     if isFastPrtye:
         GR_AMR = [
             {"k": k, "k2": k2, "learning_rate": lr, "n_epochs": 1}
             for k in (32, 64, 128)
             for k2 in (16, 32)
             for lr in (0.001,)
-        ][0:5]
+        ][:maxConfigs]
     else:
         GR_AMR = [
             {"k": k, "k2": k2, "learning_rate": lr, "n_epochs": nEpochs}
             for k in (32, 64, 128)
             for k2 in (16, 32)
             for lr in (0.001,)
-        ][0:5]
+        ][:maxConfigs]
     # Assemble parameter grid
     parametersGrid = {
         "MF": GR_MF,
@@ -91,3 +93,74 @@ def getParametersGrid(isFastPrtye: bool = True, nEpochs: int = 10):
         "AMR": GR_AMR,
     }
     return parametersGrid
+
+
+def getParametersSpace(isFastPrtye: bool = True, nEpochs: int = 10):
+    """
+    Get the (continuous) search space for different optimizers, used by the TPE search.
+    Each hyperparameter is either a fixed value or a range dictionary with its 'low'
+    and 'high' bounds, sampled on a 'log' scale and rounded if 'int' is set.
+
+    Parameters
+    ----------
+    isFastPrtye: bool, optional
+        Flag to indicate if a fast prototype is being used. Default is True.
+    nEpochs: int, optional
+        The number of epochs to use for training. Default is 10.
+
+    Returns
+    -------
+    parametersSpace: dict
+        A dictionary containing the search space for each optimizer.
+    """
+    print(
+        f"- Preparing search space for optimizers (prototype='{isFastPrtye}', epochs={nEpochs}) ..."
+    )
+    # Variables
+    epochs = 1 if isFastPrtye else nEpochs
+    K = {"low": 16, "high": 256, "log": True, "int": True}
+    K2 = {"low": 4, "high": 64, "log": True, "int": True}
+    # Define search spaces
+    SP_MF = {
+        "k": K,
+        "learning_rate": {"low": 1e-4, "high": 5e-2, "log": True},
+        "lambda_reg": {"low": 1e-4, "high": 1e-1, "log": True},
+        "max_iter": 50,
+    }
+    SP_VAECF = {
+        "k": K,
+        "learning_rate": {"low": 1e-4, "high": 1e-2, "log": True},
+        "beta": {"low": 1e-3, "high": 1.0, "log": True},
+    }
+    SP_VBPR = {
+        "k": K,
+        "k2": K2,
+        "learning_rate": {"low": 1e-4, "high": 1e-2, "log": True},
+        "lambda_w": {"low": 1e-4, "high": 1e-1, "log": True},
+        "lambda_b": {"low": 1e-4, "high": 1e-1, "log": True},
+        "n_epochs": epochs,
+    }
+    SP_VMF = {
+        "k": K,
+        "learning_rate": {"low": 1e-3, "high": 5e-2, "log": True},
+        "lambda_u": {"low": 1e-4, "high": 1e-1, "log": True},
+        "lambda_v": {"low": 1e-4, "high": 1e-1, "log": True},
+        "n_epochs": epochs,
+    }
+    SP_AMR = {
+        "k": K,
+        "k2": K2,
+        "learning_rate": {"low": 1e-4, "high": 1e-2, "log": True},
+        "lambda_w": {"low": 1e-4, "high": 1e-1, "log": True},
+        "lambda_b": {"low": 1e-4, "high": 1e-1, "log": True},
+        "n_epochs": epochs,
+    }
+    # Assemble search space
+    parametersSpace = {
+        "MF": SP_MF,
+        "VAECF": SP_VAECF,
+        "VBPR": SP_VBPR,
+        "VMF": SP_VMF,
+        "AMR": SP_AMR,
+    }
+    return parametersSpace
@@ -0,0 +1,216 @@
+import time
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from popcorn.utils import releaseSharedArrays
+from popcorn.optimizers.early_stopping import EPOCH_PARAMS, getEarlyStopping
+from popcorn.optimizers.cache import getTrialCache
+from popcorn.optimizers.telemetry import getTrialTelemetry
+from popcorn.optimizers.grid import (
+    fitAndScore,
+    prepareValidation,
+    getParallelSettings,
+    _shareGridData,
+    _initGridWorker,
+    _indexModalities,
+)
+import popcorn.optimizers.grid as gridModule
+
+
+def estimateTrialCost(cornacModel, params: dict, fitArgs: tuple = ()) -> float:
+    """
+    Estimate the relative cost of a trial: its epochs times the size of its user/item
+    factors, plus the projection of the modality features for multimodal models.
+
+    Parameters
+    ----------
+    cornacModel: class
+        The Cornac model class of the trial.
+    params: dict
+        The hyperparameters of the trial.
+    fitArgs: tuple, optional
+        The (image, feature) modalities of the trial.
+
+    Returns
+    -------
+    float
+        The estimated cost (only meaningful to compare trials).
+    """
+    defaults = {
+        key: value.default
+        for key, value in inspect.signature(cornacModel).parameters.items()
+    }
+
+    def get(key: str, default=0):
+        value = params.get(key, defaults.get(key, default))
+        return value if isinstance(value, (int, float)) else default
+
+    epochs = next((get(k) for k in EPOCH_PARAMS if k in params or k in defaults), 1)
+    featureDim = sum(
+        m.features.shape[1]
+        for m in fitArgs
+        if m is not None and getattr(m, "features", None) is not None
+    )
+    return float(max(epochs, 1)) * (get("k", 10) + get("k2") * featureDim)
+
+
+def _scheduledTrialTask(job: dict):
+    """
+    Run one scheduled trial in a worker process (its modalities are picked from the
+    shared ones), returning only its metric and parameters.
+    """
+    state = gridModule._gridWorkerState
+    smetric, _, paramCopy = fitAndScore(
+        job["model_class"],
+        job["params"],
+        state["train_fit_set"],
+        state["val_data"],
+        tuple(None if p is None else state["fit_args"][p] for p in job["modalities"]),
+        state["seed"],
+        state["use_gpu"],
+        state["block_size"],
+        job["trial_cache"],
+        state["early_stopping"],
+        job["telemetry"],
+    )
+    return smetric, None, paramCopy
+
+
+def scheduleTrials(dataDict: dict, scenarios: list) -> dict:
+    """
+    Performs the grid search of several scenarios at once: the trials of all scenarios
+    are flattened into a single job list, ordered from the most to the least expensive
+    (to shorten the tail of the run), and run on one shared worker pool. Each scenario
+    is reduced to its best trial as soon as all its trials are finished.
+
+    Parameters
+    ----------
+    dataDict: dict
+        A dictionary containing the data to be used for hyperparameter optimization.
+    scenarios: list
+        The scenarios, as dictionaries with their 'tag', 'model_class', 'name',
+        'scenario', parameter 'grid' and 'fit_args' (modalities).
+
+    Returns
+    -------
+    modelsCfg: dict
+        A dictionary mapping the scenario tags to their best model and hyperparameters
+        (the model is fitted in the 'thread' backend, unfitted in the 'process' one).
+    """
+    # Variables
+    start = time.time()
+    modelsCfg = {}
+    config = dataDict["config"]
+    trainFitSet = dataDict["train_fit_set"]
+    valData = dataDict.get("val_data")
+    if valData is None:
+        valData = prepareValidation(dataDict["val_grp"], trainFitSet)
+        dataDict["val_data"] = valData
+    # Config Variables
+    seed = config["setup"]["seed"]
+    useGPU = config["setup"]["use_gpu"]
+    blockSize = config["recommender"]["batch_size"]
+    parallelHPO, backend, nWorkers = getParallelSettings(config)
+    earlyStopping = getEarlyStopping(config)
+    # Share each distinct modality once (scenarios of several models reuse them)
+    modalities, indices = _indexModalities([scn["fit_args"] for scn in scenarios])
+    # Flatten the trials of all scenarios, the most expensive first
+    jobs = []
+    for idx, scn in enumerate(scenarios):
+        trialCache = getTrialCache(config, dataDict, scn["fit_args"])
+        for params in scn["grid"]:
+            jobs.append(
+                {
+                    "scenario": idx,
+                    "model_class": scn["model_class"],
+                    "params": params,
+                    "modalities": indices[idx],
+                    "trial_cache": trialCache,
+                    "telemetry": getTrialTelemetry(dataDict, scn["name"], scn["scenario"]),
+                    "cost": estimateTrialCost(
+                        scn["model_class"], params, scn["fit_args"]
+                    ),
+                }
+            )
+    jobs.sort(key=lambda job: job["cost"], reverse=True)
+    nWorkers = max(1, min(nWorkers, len(jobs))) if parallelHPO else 1
+    print(
+        f"- Scheduling {len(jobs)} trials of {len(scenarios)} HPO scenarios on {nWorkers} workers (backend: {backend}) ..."
+    )
+
+    # Evaluation function
+    def scheduledEvalCalculator(job: dict):
+        scn = scenarios[job["scenario"]]
+        return fitAndScore(
+            job["model_class"],
+            job["params"],
+            trainFitSet,
+            valData,
+            scn["fit_args"],
+            seed,
+            useGPU,
+            blockSize,
+            job["trial_cache"],
+            earlyStopping,
+            job["telemetry"],
+        )
+
+    # Reduction of a finished trial into its scenario
+    remaining = [len(scn["grid"]) for scn in scenarios]
+    bests = [None] * len(scenarios)
+
+    def reduceTrial(job: dict, result: tuple):
+        idx = job["scenario"]
+        if bests[idx] is None or result[0] > bests[idx][0]:
+            bests[idx] = result
+        remaining[idx] -= 1
+        if remaining[idx] > 0:
+            return
+        scn, best = scenarios[idx], bests[idx]
+        print(
+            f"-- Found the best case: '{scn['name']}' in '{scn['scenario']}', item '{best[2]}' ({best[0]:.4f}), done in {time.time()-start:.1f}s."
+        )
+        # Only the parameters of the best trial come back from the worker processes
+        bestModel = best[1]
+        if bestModel is None:
+            bestModel = scn["model_class"](seed=seed, **best[2])
+        modelsCfg[scn["tag"]] = (bestModel, best[2])
+
+    # Run the trials on the shared pool
+    if nWorkers > 1 and backend == "process":
+        handles, specs, dataset, shells = _shareGridData(
+            trainFitSet, valData, tuple(modalities)
+        )
+        settings = {
+            "seed": seed,
+            "use_gpu": useGPU,
+            "block_size": blockSize,
+            "early_stopping": earlyStopping,
+        }
+        try:
+            with ProcessPoolExecutor(
+                max_workers=nWorkers,
+                initializer=_initGridWorker,
+                initargs=(None, specs, dataset, shells, settings),
+            ) as ex:
+                futures = {ex.submit(_scheduledTrialTask, job): job for job in jobs}
+                for future in as_completed(futures):
+                    reduceTrial(futures[future], future.result())
+        finally:
+            releaseSharedArrays(handles)
+    elif nWorkers > 1:
+        # (trials are reduced in the workers, so the losing models are released early)
+        lock = threading.Lock()
+
+        def reducedEvalCalculator(job: dict):
+            result = scheduledEvalCalculator(job)
+            with lock:
+                reduceTrial(job, result)
+
+        with ThreadPoolExecutor(max_workers=nWorkers) as ex:
+            list(ex.map(reducedEvalCalculator, jobs))
+    else:
+        for job in jobs:
+            reduceTrial(job, scheduledEvalCalculator(job))
+    # Keep the order of the scenarios
+    return {scn["tag"]: modelsCfg[scn["tag"]] for scn in scenarios if scn["grid"]}
@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import threading
+import pandas as pd
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # (not available on Windows)
+    resource = None
+
+
+def getPeakRssMb() -> float:
+    """
+    Get the peak resident memory of the current process in MB (None if not available).
+    [Note]: the peak is process-wide, so threads of the same worker share it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024**2) if sys.platform == "darwin" else peak / 1024
+
+
+def getWorkerId() -> str:
+    """
+    Get the identifier of the current worker (process ID and thread name).
+    """
+    return f"{os.getpid()}-{threading.current_thread().name}"
+
+
+def initTelemetry(config: dict) -> dict:
+    """
+    Prepare the per-trial HPO telemetry of a run, or None if it is disabled.
+    The trial records are appended to 'hpo_trials_{model choice}.jsonl' in the outputs.
+
+    Parameters
+    ----------
+    config: dict
+        The configuration dictionary containing experiment settings.
+
+    Returns
+    -------
+    telemetry: dict
+        The 'path' of the records and the 'run' they belong to, or None.
+    """
+    if not config["setup"]["hpo_telemetry"]:
+        return None
+    rootPath = config["general"]["root_path"]
+    outputPath = config["general"]["output_path"]
+    modelChoice = config["setup"]["model_choice"]
+    outputSavePath = os.path.join(rootPath, "outputs") if outputPath == "" else outputPath
+    os.makedirs(outputSavePath, exist_ok=True)
+    return {
+        "path": os.path.join(outputSavePath, f"hpo_trials_{modelChoice}.jsonl"),
+        "run": datetime.now().isoformat(timespec="microseconds"),
+    }
+
+
+def getTrialTelemetry(dataDict: dict, name: str, scenario: str) -> dict:
+    """
+    Get the telemetry context of the trials of a scenario (None if telemetry is disabled).
+
+    Parameters
+    ----------
+    dataDict: dict
+        The HPO data dictionary (with the run 'telemetry' prepared by 'initTelemetry').
+    name: str
+        The name of the model (e.g., 'VBPR').
+    scenario: str
+        The scenario of the model.
+
+    Returns
+    -------
+    telemetry: dict
+        The run telemetry with the 'model' and 'scenario' of the trials, or None.
+    """
+    telemetry = dataDict.get("telemetry")
+    if telemetry is None:
+        return None
+    return {**telemetry, "model": name, "scenario": scenario}
+
+
+def writeTrialRecord(telemetry: dict, record: dict):
+    """
+    Append a trial record (with its run, model, scenario, worker and peak memory).
+    [Note]: each record is a single appended line, so workers can share the file.
+
+    Parameters
+    ----------
+    telemetry: dict
+        The trial telemetry context returned by 'getTrialTelemetry'.
+    record: dict
+        The measurements of the trial (e.g., 'params', 'fit_s', 'eval_s').
+    """
+    record = {
+        "run": telemetry["run"],
+        "model": telemetry["model"],
+        "scenario": telemetry["scenario"],
+        **record,
+        "peak_rss_mb": getPeakRssMb(),
+        "worker": getWorkerId(),
+        "saved_at": datetime.now().isoformat(timespec="microseconds"),
+    }
+    line = json.dumps(record, default=str) + "\n"
+    with open(telemetry["path"], "a") as recordFile:
+        recordFile.write(line)
+
+
+def summarizeTelemetry(telemetry: dict) -> pd.DataFrame:
+    """
+    Summarize the trial records of a run per scenario, export the run records as a CSV
+    file (next to the JSON-lines file) and print the summary.
+
+    Parameters
+    ----------
+    telemetry: dict
+        The run telemetry returned by 'initTelemetry'.
+
+    Returns
+    -------
+    summary: pd.DataFrame
+        The number of (cached) trials, the total fit and evaluation seconds, the mean
+        evaluation throughput, the best metric and the peak memory of each scenario.
+    """
+    if telemetry is None or not os.path.exists(telemetry["path"]):
+        return None
+    with open(telemetry["path"]) as recordFile:
+        records = [json.loads(line) for line in recordFile if line.strip()]
+    records = [r for r in records if r["run"] == telemetry["run"]]
+    if not records:
+        return None
+    trialsDF = pd.DataFrame(records)
+    trialsDF["params"] = trialsDF["params"].map(lambda p: json.dumps(p, default=str))
+    trialsDF.to_csv(f"{os.path.splitext(telemetry['path'])[0]}.csv", index=False)
+    summary = (
+        trialsDF.groupby(["model", "scenario"], sort=False)
+        .agg(
+            trials=("metric", "size"),
+            cached=("cached", "sum"),
+            fit_s=("fit_s", "sum"),
+            eval_s=("eval_s", "sum"),
+            users_per_s=("users_per_s", "mean"),
+            best_metric=("metric", "max"),
+            peak_rss_mb=("peak_rss_mb", "max"),
+            workers=("worker", "nunique"),
+        )
+        .reset_index()
+    )
+    print(f"- HPO telemetry saved in '{telemetry['path']}'! Summary per scenario:")
+    print(summary.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    return summary
@@ -0,0 +1,379 @@
+import os
+import json
+import time
+import numpy as np
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from popcorn.utils import releaseSharedArrays
+from popcorn.optimizers.cache import getTrialCache
+from popcorn.optimizers.early_stopping import EPOCH_PARAMS, getEarlyStopping
+from popcorn.optimizers.telemetry import getTrialTelemetry
+from popcorn.optimizers.grid import (
+    fitAndScore,
+    prepareValidation,
+    getParallelSettings,
+    _shareGridData,
+    _initGridWorker,
+    _gridTrialTask,
+)
+
+
+def _toUnit(spec: dict, value) -> float:
+    """
+    Map a value of a range hyperparameter into [0, 1] (on its log scale if set).
+    """
+    low, high, value = float(spec["low"]), float(spec["high"]), float(value)
+    if spec.get("log"):
+        low, high, value = np.log(low), np.log(high), np.log(value)
+    return float(np.clip((value - low) / (high - low), 0.0, 1.0))
+
+
+def _fromUnit(spec: dict, unit: float):
+    """
+    Map a [0, 1] position back into a value of a range hyperparameter.
+    """
+    low, high = float(spec["low"]), float(spec["high"])
+    if spec.get("log"):
+        value = float(np.exp(np.log(low) + unit * (np.log(high) - np.log(low))))
+    else:
+        value = low + unit * (high - low)
+    if spec.get("int"):
+        return int(round(value))
+    # Keep 4 significant digits (readable logs and stable trial keys)
+    return float(f"{value:.4g}")
+
+
+def isInSpace(params: dict, paramSpace: dict) -> bool:
+    """
+    Check whether a set of hyperparameters belongs to a search space.
+
+    Parameters
+    ----------
+    params: dict
+        The hyperparameters of a trial.
+    paramSpace: dict
+        The search space (fixed values or 'low'/'high' range dictionaries).
+
+    Returns
+    -------
+    bool
+        True if all hyperparameters match the fixed values and ranges of the space
+        (early stopped trials may have fewer epochs than the fixed epoch budget).
+    """
+    if set(params) != set(paramSpace):
+        return False
+    for key, spec in paramSpace.items():
+        if not isinstance(spec, dict):
+            if key in EPOCH_PARAMS and isinstance(spec, int):
+                if not 1 <= params[key] <= spec:
+                    return False
+            elif params[key] != spec:
+                return False
+        elif not spec["low"] <= params[key] <= spec["high"]:
+            return False
+    return True
+
+
+def _parzenLogPdf(x: np.ndarray, observations: np.ndarray) -> np.ndarray:
+    """
+    Log-density of a Parzen estimator over [0, 1] (Gaussian kernels on the observations
+    mixed with a uniform prior weighted as one more observation).
+    """
+    nObs = len(observations)
+    density = np.full(len(x), 1.0 / (nObs + 1))
+    if nObs > 0:
+        sigma = np.clip(1.06 * np.std(observations) * nObs ** (-0.2), 0.05, 0.5)
+        z = (x[:, None] - observations[None, :]) / sigma
+        kernels = np.exp(-0.5 * z**2) / (sigma * np.sqrt(2 * np.pi))
+        density += kernels.sum(axis=1) / (nObs + 1)
+    return np.log(density)
+
+
+def _sampleParzen(
+    observations: np.ndarray, size: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Sample positions in [0, 1] from the Parzen estimator of the observations.
+    """
+    nObs = len(observations)
+    samples = rng.random(size)
+    if nObs == 0:
+        return samples
+    sigma = np.clip(1.06 * np.std(observations) * nObs ** (-0.2), 0.05, 0.5)
+    component = rng.integers(0, nObs + 1, size)
+    fromKernel = component < nObs
+    samples[fromKernel] = rng.normal(observations[component[fromKernel]], sigma)
+    return np.clip(samples, 0.0, 1.0)
+
+
+def proposeParams(
+    paramSpace: dict,
+    history: list,
+    nProposals: int = 1,
+    rng: np.random.Generator = None,
+    nStartup: int = 5,
+    gamma: float = 0.25,
+    nCandidates: int = 24,
+) -> list:
+    """
+    Propose the next hyperparameters to try with a tree-structured Parzen estimator (TPE).
+    The trials are split into the best 'gamma' fraction and the rest, and each proposal
+    maximizes the ratio of their (per-hyperparameter) densities over candidates drawn from
+    the best trials. Random proposals are made until 'nStartup' trials are known.
+    Several proposals are diversified by counting the pending ones as bad trials.
+
+    Parameters
+    ----------
+    paramSpace: dict
+        The search space (fixed values or 'low'/'high' range dictionaries).
+    history: list
+        The finished trials, as dictionaries with 'params' and 'metric'.
+    nProposals: int, optional
+        The number of proposals (e.g., one per parallel worker, default is 1).
+    rng: np.random.Generator, optional
+        The random generator (default is a new unseeded one).
+    nStartup: int, optional
+        The number of trials before the TPE takes over from random search (default is 5).
+    gamma: float, optional
+        The fraction of trials considered as good (default is 0.25).
+    nCandidates: int, optional
+        The number of candidates scored for each proposal (default is 24).
+
+    Returns
+    -------
+    proposals: list
+        The proposed hyperparameter dictionaries.
+    """
+    # Variables
+    rng = np.random.default_rng() if rng is None else rng
+    ranges = [key for key, spec in paramSpace.items() if isinstance(spec, dict)]
+    trials = [(t["params"], t["metric"]) for t in history]
+    worst = min((metric for _, metric in trials), default=0.0)
+    proposals = []
+    for _ in range(nProposals):
+        units = {key: rng.random() for key in ranges}
+        if len(trials) >= nStartup and ranges:
+            # Split the trials into good and bad ones
+            order = sorted(range(len(trials)), key=lambda i: trials[i][1], reverse=True)
+            nGood = max(1, int(np.ceil(gamma * len(trials))))
+            good, bad = order[:nGood], order[nGood:]
+            # Score the candidates drawn from the good trials, one hyperparameter at a time
+            scores = np.zeros(nCandidates)
+            candidates = {}
+            for key in ranges:
+                spec = paramSpace[key]
+                goodObs = np.array([_toUnit(spec, trials[i][0][key]) for i in good])
+                badObs = np.array([_toUnit(spec, trials[i][0][key]) for i in bad])
+                candidates[key] = _sampleParzen(goodObs, nCandidates, rng)
+                scores += _parzenLogPdf(candidates[key], goodObs)
+                scores -= _parzenLogPdf(candidates[key], badObs)
+            best = int(np.argmax(scores))
+            units = {key: candidates[key][best] for key in ranges}
+        params = {
+            key: _fromUnit(spec, units[key]) if isinstance(spec, dict) else spec
+            for key, spec in paramSpace.items()
+        }
+        proposals.append(params)
+        # Pending proposals count as bad trials (constant liar)
+        trials.append((params, worst))
+    return proposals
+
+
+def loadTrials(logPath: str, name: str, scenario: str, paramSpace: dict = None) -> list:
+    """
+    Load the logged trials of a model and scenario (e.g., to warm-start a search).
+
+    Parameters
+    ----------
+    logPath: str
+        The path of the JSON-lines trial log.
+    name: str
+        The name of the model (e.g., 'VBPR').
+    scenario: str
+        The scenario of the model.
+    paramSpace: dict, optional
+        The search space the trials should belong to (default is no check).
+
+    Returns
+    -------
+    trials: list
+        The matching trials, as dictionaries with 'params' and 'metric'.
+    """
+    trials = []
+    if not logPath or not os.path.exists(logPath):
+        return trials
+    with open(logPath) as logFile:
+        for line in logFile:
+            if not line.strip():
+                continue
+            trial = json.loads(line)
+            if trial.get("model") != name or trial.get("scenario") != scenario:
+                continue
+            if paramSpace is not None and not isInSpace(trial["params"], paramSpace):
+                continue
+            trials.append(trial)
+    return trials
+
+
+def tpeSearch(
+    dataDict: dict, cornacModel, name: str, scenario: str, paramSpace: dict, *fit_args
+) -> dict:
+    """
+    Performs hyperparameter optimization (HPO) using a budgeted TPE search for a given
+    model class. Batches of trials (one per parallel worker) are proposed from the
+    finished ones until the trial or wall-clock budget is spent. Every trial is logged,
+    and the logged trials of the same model, scenario and space warm-start the search.
+
+    Parameters
+    ----------
+    dataDict: dict
+        A dictionary containing the data to be used for hyperparameter optimization.
+    cornacModel: class
+        The Cornac model class for which to perform hyperparameter optimization.
+    name: str
+        The name of the model being optimized.
+    scenario: str
+        The scenario or modality for which the model is being optimized.
+    paramSpace: dict
+        A dictionary containing the search space (see 'getParametersSpace').
+    fit_args: tuple
+        Additional arguments to be passed to the model fitting function.
+
+    Returns
+    -------
+    bestModel: object
+        The best model (fitted, unless it comes from the log or a worker process).
+    bestParams: dict
+        The hyperparameters of the best model.
+    """
+    # Variables
+    start = time.time()
+    config = dataDict["config"]
+    trainFitSet = dataDict["train_fit_set"]
+    valData = dataDict.get("val_data")
+    if valData is None:
+        valData = prepareValidation(dataDict["val_grp"], trainFitSet)
+    # Config Variables
+    seed = config["setup"]["seed"]
+    useGPU = config["setup"]["use_gpu"]
+    blockSize = config["recommender"]["batch_size"]
+    tpeCfg = config["setup"]["tpe"]
+    nTrials, timeBudget = tpeCfg["n_trials"], tpeCfg["time_budget"]
+    nStartup, gamma = tpeCfg["n_startup"], tpeCfg["gamma"]
+    nCandidates, logDir = tpeCfg["n_candidates"], tpeCfg["log_path"]
+    parallelHPO, backend, nWorkers = getParallelSettings(config)
+    # Check the arguments
+    if not isinstance(nTrials, int) or nTrials < 1:
+        print(f"- [Warning] Invalid number of TPE trials {nTrials}. Using 20 trials.")
+        nTrials = 20
+    if not isinstance(timeBudget, (int, float)) or timeBudget < 0:
+        print(f"- [Warning] Invalid TPE time budget {timeBudget}. Using no limit.")
+        timeBudget = 0
+    if not isinstance(gamma, (int, float)) or not 0 < gamma < 1:
+        print(f"- [Warning] Invalid TPE good fraction {gamma}. Using 0.25.")
+        gamma = 0.25
+    nWorkers = nWorkers if parallelHPO else 1
+    rng = np.random.default_rng(seed)
+    logPath = os.path.join(logDir, f"tpe_{name}_{scenario}.jsonl") if logDir else ""
+    if logDir:
+        os.makedirs(logDir, exist_ok=True)
+    history = loadTrials(logPath, name, scenario, paramSpace)
+    nWarm = len(history)
+    print(
+        f"-- TPE search '{name}' in scenario '{scenario}' with {nTrials} trials (warm start: {nWarm}, time budget: {timeBudget or '-'}s, workers: {nWorkers}) ..."
+    )
+
+    trialCache = getTrialCache(config, dataDict, fit_args)
+    earlyStopping = getEarlyStopping(config)
+    telemetry = getTrialTelemetry(dataDict, name, scenario)
+
+    # Evaluation function
+    def tpeEvalCalculator(params: dict):
+        return fitAndScore(
+            cornacModel,
+            params,
+            trainFitSet,
+            valData,
+            fit_args,
+            seed,
+            useGPU,
+            blockSize,
+            trialCache,
+            earlyStopping,
+            telemetry,
+        )
+
+    # Prepare the trial executor (the same backends as the grid search)
+    executor, task, handles = None, tpeEvalCalculator, None
+    if nWorkers > 1 and backend == "process":
+        handles, specs, dataset, shells = _shareGridData(trainFitSet, valData, fit_args)
+        settings = {
+            "seed": seed,
+            "use_gpu": useGPU,
+            "block_size": blockSize,
+            "trial_cache": trialCache,
+            "early_stopping": earlyStopping,
+            "telemetry": telemetry,
+        }
+        executor = ProcessPoolExecutor(
+            max_workers=nWorkers,
+            initializer=_initGridWorker,
+            initargs=(cornacModel, specs, dataset, shells, settings),
+        )
+        task = _gridTrialTask
+    elif nWorkers > 1:
+        executor = ThreadPoolExecutor(max_workers=nWorkers)
+    # Run the trials batch by batch until a budget is spent
+    bestModel, bestTrial = None, None
+    try:
+        while len(history) - nWarm < nTrials:
+            # (at least one batch runs)
+            if len(history) > nWarm and timeBudget and time.time() - start >= timeBudget:
+                print(f"-- Time budget of {timeBudget}s spent! Stopping the search ...")
+                break
+            batch = proposeParams(
+                paramSpace,
+                history,
+                min(nWorkers, nTrials - len(history) + nWarm),
+                rng,
+                nStartup,
+                gamma,
+                nCandidates,
+            )
+            if executor is not None:
+                results = list(executor.map(task, batch))
+            else:
+                results = [task(params) for params in batch]
+            bestMetric = max((t["metric"] for t in history), default=float("-inf"))
+            # (the returned parameters hold the epochs chosen by early stopping)
+            for metric, model, trialParams in results:
+                trial = {
+                    "model": name,
+                    "scenario": scenario,
+                    "trial": len(history),
+                    "params": trialParams,
+                    "metric": float(metric),
+                    "seed": seed,
+                    "saved_at": datetime.now().isoformat(timespec="microseconds"),
+                }
+                history.append(trial)
+                # Keep only the best fitted model in memory
+                if metric > bestMetric:
+                    bestMetric, bestModel, bestTrial = metric, model, trial["trial"]
+                if logPath:
+                    with open(logPath, "a") as logFile:
+                        logFile.write(json.dumps(trial, default=str) + "\n")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if handles is not None:
+            releaseSharedArrays(handles)
+    # Get best result
+    best = max(history, key=lambda x: x["metric"])
+    print(
+        f"-- Found the best case: '{name}' in '{scenario}', item '{best['params']}' ({best['metric']:.4f}), done in {time.time()-start:.1f}s."
+    )
+    # Only the parameters come back from the log and the worker processes
+    if best["trial"] != bestTrial or bestModel is None:
+        bestModel = cornacModel(seed=seed, **best["params"])
+    return bestModel, best["params"]
@@ -255,6 +255,38 @@ def modelSelected(tag: str, model: str) -> bool:
     )
 
 
+def getDatasetView(baseDataset: object, imgModality=None, featModality=None):
+    """
+    Get a lightweight view of a training dataset with the given item modalities.
+    The view shares the interaction arrays, index maps and cached matrices of the base
+    dataset (nothing is copied), while its own attributes (modalities, random generator
+    reset by 'fit') stay isolated, so concurrent trials do not interfere.
+
+    Parameters
+    ----------
+    baseDataset: cornac.data.Dataset
+        The training dataset containing user-item interactions.
+    imgModality: cornac.data.ImageModality, optional
+        The item image modality to be overlaid on the view.
+    featModality: cornac.data.FeatureModality, optional
+        The item feature modality to be overlaid on the view.
+
+    Returns
+    -------
+    view: cornac.data.Dataset
+        A shallow copy of the dataset with the overlaid modalities.
+    """
+    # Build the interaction matrix once on the base, so that all views share it
+    baseDataset.csr_matrix
+    view = copy.copy(baseDataset)
+    # Set modalities if provided
+    if imgModality is not None:
+        view.item_image = imgModality
+    if featModality is not None:
+        view.item_feature = featModality
+    return view
+
+
 def fitModalities(
     model: object, baseDataset: object, imgModality=None, featModality=None
 ):
@@ -281,12 +313,7 @@ def fitModalities(
     if model is None:
         print("- [Warn] The model is None. Returning without fitting the model.")
         return
-    # Get a copy of the training set to avoid modifying the original
-    tempSet = copy.deepcopy(baseDataset)
-    # Set modalities if provided
-    if imgModality is not None:
-        tempSet.item_image = imgModality
-    if featModality is not None:
-        tempSet.item_feature = featModality
+    # Get a view of the training set to avoid modifying (or copying) the original
+    tempSet = getDatasetView(baseDataset, imgModality, featModality)
     # Fit the model with the modified training set
     model.fit(tempSet)
@@ -1,5 +1,6 @@
+import io
 import pandas as pd
-from popcorn.utils import loadJsonFromUrl
+from popcorn.utils import loadJsonFromUrl, fetchUrl
 from popcorn.datasets.popcorn.utils import METADATA_URL
 from popcorn.datasets.mmtf14k.utils import VIS_FUSED_URL, VIS_FUSED_FILE_MAP
 
@@ -19,7 +20,7 @@ def getMovieList(dataset: str, configs: dict) -> list[dict]:
     if dataset == "mmtf":
         # Get the address
         addr = VIS_FUSED_URL + VIS_FUSED_FILE_MAP["avf"]
-        data = pd.read_csv(addr, low_memory=False)
+        data = pd.read_csv(io.BytesIO(fetchUrl(addr)), low_memory=False)
         # Pick only 'itemId' and 'title'
         dff = data[["itemId", "title"]]
         # Iterate over dff and add to movieList
@@ -4,6 +4,7 @@ import requests
 import pandas as pd
 from pathlib import Path
 from typing import Optional
+from popcorn.utils import getHttpSession
 from popcorn.pipelines.thumbnail_fetch.tmdb import fetchPosterPath, buildPosterUrl
 from popcorn.pipelines.thumbnail_fetch.utils import (
     movielensToIMDB,
@@ -66,7 +67,7 @@ def downloadThumbnail(
     downloadPath: str
         The base directory path where the poster should be saved.
     session: Optional[requests.Session]
-        An optional requests session to use for API calls. If None, a new session will be created and closed within this function.
+        An optional requests session to use for API calls. If None, the shared HTTP session is used.
     posterSize: str
         The desired size of the poster image (default 'w500').
     delay: float
@@ -80,9 +81,8 @@ def downloadThumbnail(
     # Variables
     apiKey = configs["pipelines"]["thumbnail_fetch"]["tmdb_api_key"]
     # Session management
-    ownSession = session is None
-    if ownSession:
-        session = requests.Session()
+    if session is None:
+        session = getHttpSession()
     # Get IMDb ID and title from the movie dict
     imdbId = (
         movie["id"]
@@ -98,24 +98,20 @@ def downloadThumbnail(
         "success": False,
     }
     # Process the movie
-    try:
-        print(f"-- Processing {title} ({imdbId}) ...")
-        posterPath = fetchPosterPath(imdbId, apiKey, session)
-        if not posterPath:
-            return result
-        # Build the full image URL and destination path
-        imgUrl = buildPosterUrl(posterPath, size=posterSize)
-        ext = Path(posterPath).suffix or ".jpg"
-        filename = str(movie["id"]) + ext  # 'safeFilename(title) + ext'
-        dest = Path(downloadPath) / filename
-        # Download the image
-        if downloadImage(imgUrl, dest, session):
-            result.update(url=imgUrl, path=str(dest), success=True)
-            print(f"-- Saved → {dest}")
-        time.sleep(delay)
-    finally:
-        if ownSession:
-            session.close()
+    print(f"-- Processing {title} ({imdbId}) ...")
+    posterPath = fetchPosterPath(imdbId, apiKey, session)
+    if not posterPath:
+        return result
+    # Build the full image URL and destination path
+    imgUrl = buildPosterUrl(posterPath, size=posterSize)
+    ext = Path(posterPath).suffix or ".jpg"
+    filename = str(movie["id"]) + ext  # 'safeFilename(title) + ext'
+    dest = Path(downloadPath) / filename
+    # Download the image
+    if downloadImage(imgUrl, dest, session):
+        result.update(url=imgUrl, path=str(dest), success=True)
+        print(f"-- Saved → {dest}")
+    time.sleep(delay)
 
     return result
 
@@ -181,19 +177,19 @@ def downloadThumbnails(
         )
         return results
     # Download thumbnails
-    with requests.Session() as session:
-        for movie in movies:
-            result = downloadThumbnail(
-                movie,
-                DATASET,
-                linksDF,
-                downloadPath,
-                session,
-                POSTER_SIZE,
-                delay,
-                configs,
-            )
-            results.append(result)
+    session = getHttpSession()
+    for movie in movies:
+        result = downloadThumbnail(
+            movie,
+            DATASET,
+            linksDF,
+            downloadPath,
+            session,
+            POSTER_SIZE,
+            delay,
+            configs,
+        )
+        results.append(result)
     # Summary
     print("\nSummary:")
     for r in results:
@@ -1,5 +1,5 @@
 import os
-import requests
+from popcorn.utils import httpGet
 from popcorn.pipelines.utils import videoFormats
 
 
@@ -46,7 +46,7 @@ def downloadVideoFile(url: str, downloadPath: str, fileName: str, format: str =
     fileName = f"{fileName}.{format}"
     # Download the video file
     try:
-        response = requests.get(url)
+        response = httpGet(url)
         response.raise_for_status()
         # Create download address
         downloadPath = os.path.join(downloadPath, fileName)
@@ -1,6 +1,5 @@
 import numpy as np
 from popcorn.datasets.utils import applyKcore
-from popcorn.utils import convertStrToListCol
 from popcorn.modalities.fuse_all import createMultimodalDF
 from popcorn.datasets.movielens.loader import loadMovieLens
 from popcorn.datasets.movielens.helper_genres import getGenreDict
@@ -100,11 +99,11 @@ def assembleModality(config: dict):
                 for cnn in aggEmbeddingUrlDict[embedding]:
                     aggEmbeddingUrlList.extend(aggEmbeddingUrlDict[embedding][cnn])
             # Load aggregated features into a DataFrame
-            dfAggEmbedsMax, dfAggEmbedsMean = loadAggEmbeddings(aggEmbeddingUrlList)
-            # Consider the 'Max' variant for assembly
+            dfAggEmbedsMax, dfAggEmbedsMean = loadAggEmbeddings(
+                aggEmbeddingUrlList, asString=False
+            )
+            # Consider the 'Max' variant for assembly (float32 arrays, no truncation)
             visualDF = dfAggEmbedsMax
-            # Apply anti-truncation to visual embeddings
-            visualDF["visual"] = convertStrToListCol(visualDF, "visual")
     elif "visual_ml25thumb" in selectedModalities:
         variant = config["datasets"]["unimodal"]["ml_thumbnail"]["variant"]
         visualDF = loadAllMovieLensThumbnailEmbeddings(variant)
@@ -0,0 +1,235 @@
+import os
+import math
+import numpy as np
+import scipy.sparse
+from concurrent.futures import ProcessPoolExecutor
+from popcorn.recommenders.ranking import getTopNMatrix
+from popcorn.recommenders.storage import writeShardToStore
+from popcorn.utils import shareArrays, attachArrays, releaseSharedArrays
+from popcorn.recommenders.metrics import METRIC_NAMES, calculateUserMetrics
+
+# Codes of the metrics calculated per user (coverage is calculated per model)
+PER_USER_METRICS = [code for code in METRIC_NAMES if code != "CV"]
+# Sparse matrices of the evaluation state (shared as data/indices/indptr arrays)
+SPARSE_STATE_KEYS = ["seen_matrix", "gt_matrix"]
+# Dense arrays of the evaluation state
+DENSE_STATE_KEYS = ["user_idx", "user_genre_counts", "genre_matrix"]
+# Maximum number of users per shard (bounds the memory of each shard)
+MAX_SHARD_SIZE = 10000
+# Worker-side evaluation state (set by the pool initializer)
+_workerState = None
+
+
+def evaluateShard(state: dict, start: int, end: int) -> dict:
+    """
+    Rank the users of a shard with every model and calculate their metrics.
+    The users are ranked once at the deepest cutoff ('top_n'), and the metrics of
+    every other cutoff (in 'cutoffs') are derived from prefixes of the same lists.
+
+    Parameters
+    ----------
+    state: dict
+        The evaluation state (models, matrices, item statistics and settings).
+    start: int
+        The first user row of the shard.
+    end: int
+        The user row after the last one of the shard.
+
+    Returns
+    -------
+    shard: dict
+        The per-user top-N and metric arrays of the shard (at the deepest cutoff),
+        plus its mergeable aggregates: metric 'sums' and 'coverage' item sets keyed
+        by cutoff, and the user 'count'.
+    """
+    # Variables
+    userIdx = state["user_idx"][start:end]
+    gtMatrix = state["gt_matrix"][start:end]
+    userGenreCounts = state["user_genre_counts"][start:end]
+    cutoffs = sorted(state.get("cutoffs") or [state["top_n"]])
+    shard = {
+        "start": start,
+        "count": end - start,
+        "top_n": {},
+        "metrics": {},
+        "sums": {n: {} for n in cutoffs},
+        "coverage": {n: {} for n in cutoffs},
+    }
+    for key, model in state["models"].items():
+        topN = getTopNMatrix(
+            model, userIdx, state["top_n"], state["seen_matrix"], state["batch_size"]
+        )
+        for n in cutoffs:
+            prefix = topN[:, :n]
+            metrics = calculateUserMetrics(
+                prefix,
+                gtMatrix,
+                state["item_stats"],
+                state["genre_matrix"],
+                userGenreCounts,
+            )
+            shard["sums"][n][key] = {m: float(np.sum(v)) for m, v in metrics.items()}
+            shard["coverage"][n][key] = set(np.unique(prefix[prefix >= 0]).tolist())
+        # The per-user metrics are kept at the deepest cutoff
+        shard["top_n"][key] = topN
+        shard["metrics"][key] = metrics
+    return shard
+
+
+def finishShard(state: dict, shard: dict) -> dict:
+    """
+    Flush the per-user results of a shard into the store (if the state has a
+    'store_path') and keep only its mergeable aggregates, to bound the memory.
+
+    Parameters
+    ----------
+    state: dict
+        The evaluation state.
+    shard: dict
+        The shard dictionary returned by 'evaluateShard'.
+
+    Returns
+    -------
+    shard: dict
+        The (possibly stripped) shard dictionary.
+    """
+    if state.get("store_path"):
+        writeShardToStore(state["store_path"], shard)
+        shard["top_n"], shard["metrics"] = {}, {}
+    return shard
+
+
+def mergeShards(shards: list) -> dict:
+    """
+    Merge the partial results of the evaluated shards (in user order).
+
+    Parameters
+    ----------
+    shards: list
+        The shard dictionaries returned by 'evaluateShard'.
+
+    Returns
+    -------
+    merged: dict
+        The concatenated 'top_n' and 'metrics' arrays (empty if the shards were
+        flushed into a store), the per-cutoff summed 'sums' and union of the
+        'coverage' item sets, and the summed 'count'.
+    """
+    # Variables
+    shards = sorted(shards, key=lambda x: x["start"])
+    merged = {"count": 0, "top_n": {}, "metrics": {}, "sums": {}, "coverage": {}}
+    if not shards:
+        return merged
+    for key in shards[0]["top_n"]:
+        merged["top_n"][key] = np.concatenate([s["top_n"][key] for s in shards])
+        merged["metrics"][key] = {
+            m: np.concatenate([s["metrics"][key][m] for s in shards])
+            for m in shards[0]["metrics"][key]
+        }
+    for n, cutoffSums in shards[0]["sums"].items():
+        merged["sums"][n], merged["coverage"][n] = {}, {}
+        for key, metricSums in cutoffSums.items():
+            merged["sums"][n][key] = {
+                m: sum(s["sums"][n][key][m] for s in shards) for m in metricSums
+            }
+            merged["coverage"][n][key] = set().union(
+                *(s["coverage"][n][key] for s in shards)
+            )
+    merged["count"] = sum(s["count"] for s in shards)
+    return merged
+
+
+def _initEvaluationWorker(models: dict, specs: dict, shapes: dict, settings: dict):
+    """
+    Initialize a worker process by attaching the shared evaluation state.
+    """
+    global _workerState
+    handles, arrays = attachArrays(specs)
+    state = {key: arrays[key] for key in DENSE_STATE_KEYS}
+    for key in SPARSE_STATE_KEYS:
+        state[key] = scipy.sparse.csr_matrix(
+            (arrays[f"{key}.data"], arrays[f"{key}.indices"], arrays[f"{key}.indptr"]),
+            shape=shapes[key],
+            copy=False,
+        )
+    state["item_stats"] = {
+        k[len("item_stats.") :]: v for k, v in arrays.items() if k.startswith("item_stats.")
+    }
+    state.update(settings)
+    state["models"] = models
+    state["handles"] = handles
+    _workerState = state
+
+
+def _evaluateShardTask(bounds: tuple) -> dict:
+    """
+    Evaluate one shard of users in a worker process.
+    """
+    return finishShard(_workerState, evaluateShard(_workerState, *bounds))
+
+
+def evaluateUsers(state: dict, nWorkers: int = 1) -> dict:
+    """
+    Evaluate all users of the state, either in-process or sharded across a process pool.
+    In the sharded mode, the matrices and item statistics are published once into shared
+    memory (not pickled per task) and each worker receives the models once.
+
+    Parameters
+    ----------
+    state: dict
+        The evaluation state, containing 'models', 'user_idx', 'seen_matrix',
+        'gt_matrix', 'user_genre_counts', 'genre_matrix', 'item_stats',
+        'top_n' (the ranking depth), 'batch_size' and optionally 'cutoffs' (the
+        evaluated prefixes, default is only 'top_n') and 'store_path' (to stream
+        the per-user results into a store created by 'initRecListStore').
+    nWorkers: int, optional
+        The number of worker processes (1 evaluates in-process, -1 uses all cores).
+
+    Returns
+    -------
+    dict
+        The merged evaluation results (see 'mergeShards').
+    """
+    # Variables
+    nUsers = len(state["user_idx"])
+    if nWorkers is not None and nWorkers < 0:
+        nWorkers = os.cpu_count() or 1
+    if not nWorkers or nWorkers < 1:
+        nWorkers = 1
+    # Split the users into a few shards per worker (to balance the load)
+    shardSize = max(1, min(math.ceil(nUsers / (nWorkers * 4)), MAX_SHARD_SIZE))
+    bounds = [(s, min(s + shardSize, nUsers)) for s in range(0, nUsers, shardSize)]
+    if nWorkers == 1 or len(bounds) < 2:
+        shards = [finishShard(state, evaluateShard(state, *b)) for b in bounds]
+        return mergeShards(shards)
+    print(
+        f"- Evaluating {nUsers:,} users in {len(bounds)} shards with {nWorkers} workers ..."
+    )
+    # Publish the state into shared memory
+    arrays = {key: state[key] for key in DENSE_STATE_KEYS}
+    shapes = {}
+    for key in SPARSE_STATE_KEYS:
+        matrix = scipy.sparse.csr_matrix(state[key])
+        arrays[f"{key}.data"] = matrix.data
+        arrays[f"{key}.indices"] = matrix.indices
+        arrays[f"{key}.indptr"] = matrix.indptr
+        shapes[key] = matrix.shape
+    for key, value in state["item_stats"].items():
+        arrays[f"item_stats.{key}"] = np.asarray(value)
+    settings = {
+        "top_n": state["top_n"],
+        "cutoffs": state.get("cutoffs"),
+        "batch_size": state["batch_size"],
+        "store_path": state.get("store_path"),
+    }
+    handles, specs = shareArrays(arrays)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=nWorkers,
+            initializer=_initEvaluationWorker,
+            initargs=(state["models"], specs, shapes, settings),
+        ) as ex:
+            shards = list(ex.map(_evaluateShardTask, bounds))
+    finally:
+        releaseSharedArrays(handles)
+    return mergeShards(shards)
@@ -1,4 +1,25 @@
+import numpy as np
 import pandas as pd
+import scipy.sparse
+from popcorn.recommenders.ranking import getUserRows
+from popcorn.recommenders.storage import loadRecListStore
+
+
+# Names of the averaged metrics ('{n}' stands for the top-N cutoff), in output order
+METRIC_NAMES = {
+    "ND": "NDCG@{n}",
+    "NO": "Novelty",
+    "RC": "Recall@{n}",
+    "FA": "Fairness",
+    "DI": "Diversity",
+    "CV": "Coverage@{n}",
+    "CR": "ColdRate@{n}",
+    "PB": "PopularityBias",
+    "CB": "CalibrationBias",
+    "HR": "HitRate",
+    "PR": "Precision",
+    "AP": "MAP",
+}
 
 
 def calculateMeanRecMetrics(recs: pd.DataFrame, top_n: int) -> list[dict]:
@@ -32,35 +53,580 @@ def calculateMeanRecMetrics(recs: pd.DataFrame, top_n: int) -> list[dict]:
     # Calculate average metrics for each model and scenario
     for col in [c for c in recs.columns if c.startswith("rec_")]:
         model, scenario = col.split("_", 2)[1:]
-        ndcg = recs[f"ND_{model}_{scenario}"].mean()
-        recall = recs[f"RC_{model}_{scenario}"].mean()
-        popBias = recs[f"PB_{model}_{scenario}"].mean()
-        novelty = recs[f"NO_{model}_{scenario}"].mean()
-        calBias = recs[f"CB_{model}_{scenario}"].mean()
-        hitrate = recs[f"HR_{model}_{scenario}"].mean()
-        fairness = recs[f"FA_{model}_{scenario}"].mean()
-        coldrate = recs[f"CR_{model}_{scenario}"].mean()
-        coverage = recs[f"CV_{model}_{scenario}"].mean()
-        diversity = recs[f"DI_{model}_{scenario}"].mean()
-        precision = recs[f"PR_{model}_{scenario}"].mean()
-        map_score = recs[f"AP_{model}_{scenario}"].mean()
+        row = {"model": model, "scenario": scenario}
+        for code, name in METRIC_NAMES.items():
+            row[name.format(n=top_n)] = recs[f"{code}_{model}_{scenario}"].mean()
         # Append the metrics for the current model and scenario
-        metricRows.append(
-            {
-                "model": model,
-                "scenario": scenario,
-                f"NDCG@{top_n}": ndcg,
-                "Novelty": novelty,
-                f"Recall@{top_n}": recall,
-                "Fairness": fairness,
-                "Diversity": diversity,
-                f"Coverage@{top_n}": coverage,
-                f"ColdRate@{top_n}": coldrate,
-                "PopularityBias": popBias,
-                "CalibrationBias": calBias,
-                "HitRate": hitrate,
-                "Precision": precision,
-                "MAP": map_score,
-            }
+        metricRows.append(row)
+    return metricRows
+
+
+def calculateMeanRecMetricsFromSums(
+    sums: dict, count: int, coverage: dict, nItems: int, top_n: int
+) -> list[dict]:
+    """
+    Calculate average metrics from the aggregates of a (sharded) evaluation,
+    without holding the per-user recommendation records.
+
+    Parameters
+    ----------
+    sums: dict
+        A dictionary mapping (model, scenario) to the sums of each per-user metric.
+    count: int
+        The number of evaluated users.
+    coverage: dict
+        A dictionary mapping (model, scenario) to the set of recommended item indices.
+    nItems: int
+        The number of items in the catalog.
+    top_n: int
+        The number of top recommendations considered for metric calculations.
+
+    Returns
+    -------
+    list of dict
+        A list of dictionaries where each dictionary contains the average metrics
+        for a specific model and scenario (same format as 'calculateMeanRecMetrics').
+    """
+    # Variables
+    metricRows = []
+    # Check the arguments
+    if not count:
+        print(
+            "- [Warn] No evaluated users provided. Returning empty metrics list ..."
         )
+        return metricRows
+    # Calculate average metrics for each model and scenario
+    for (model, scenario), metricSums in sums.items():
+        means = {code: total / count for code, total in metricSums.items()}
+        if (model, scenario) in coverage:
+            means["CV"] = len(coverage[(model, scenario)]) / nItems if nItems else 0.0
+        row = {"model": model, "scenario": scenario}
+        for code, name in METRIC_NAMES.items():
+            if code in means:
+                row[name.format(n=top_n)] = means[code]
+        metricRows.append(row)
     return metricRows
+
+
+def calculateMeanRecMetricsFromStore(
+    storePath: str,
+    top_n: int = None,
+    metricCodes: list = None,
+    coldThreshold: int = None,
+    chunkSize: int = 10000,
+) -> list[dict]:
+    """
+    Recalculate average metrics from a recommendation list store, without any model.
+    The stored top-N lists are cut at the given depth (any cutoff up to the stored one)
+    and scored against the stored ground truth, item popularity and genres, chunk by chunk.
+
+    Parameters
+    ----------
+    storePath: str
+        The directory of the store written by 'generateLists'.
+    top_n: int, optional
+        The cutoff of the lists (default is the stored depth).
+    metricCodes: list, optional
+        The codes of the metrics to calculate (e.g., ['ND', 'RC'], default is all).
+    coldThreshold: int, optional
+        The cold-start threshold of the items (default is the stored one).
+    chunkSize: int, optional
+        The number of users evaluated at once (default is 10000).
+
+    Returns
+    -------
+    list of dict
+        A list of dictionaries where each dictionary contains the average metrics
+        for a specific model and scenario (same format as 'calculateMeanRecMetrics').
+    """
+    # Variables
+    metricRows = []
+    store = loadRecListStore(storePath)
+    meta = store["meta"]
+    nUsers, depth = meta["n_users"], meta["top_n"]
+    metricCodes = list(METRIC_NAMES) if metricCodes is None else list(metricCodes)
+    # Check the arguments
+    unknownCodes = [code for code in metricCodes if code not in METRIC_NAMES]
+    if unknownCodes:
+        print(f"- [Warn] Unknown metric codes {unknownCodes}! Skipping them ...")
+        metricCodes = [code for code in metricCodes if code in METRIC_NAMES]
+    if top_n is None:
+        top_n = depth
+    if top_n <= 0 or top_n > depth:
+        print(
+            f"- [Warn] Cutoff '{top_n}' is outside the stored depth '{depth}'! Setting to {depth} ..."
+        )
+        top_n = depth
+    needsStats = any(code in metricCodes for code in ["CR", "PB", "FA", "NO"])
+    needsGenres = any(code in metricCodes for code in ["DI", "CB"])
+    if (needsStats and store["item_popularity"] is None) or (
+        needsGenres and store["genre_matrix"] is None
+    ):
+        print(
+            "- [Error] The store lacks the item popularity or genres of the requested metrics! Exiting ..."
+        )
+        return metricRows
+    # Rebuild the evaluation inputs from the stored columns
+    nItems = meta.get("n_train_items", len(store["item_ids"]))
+    gtMatrix = scipy.sparse.csr_matrix(
+        (np.ones(len(store["gt"][1]), dtype=np.float32), store["gt"][1], store["gt"][0]),
+        shape=(nUsers, len(store["item_ids"])),
+    )
+    itemStats, genreMatrix, userGenreCounts = None, None, None
+    if needsStats:
+        coldThreshold = (
+            meta.get("cold_threshold", 5) if coldThreshold is None else coldThreshold
+        )
+        itemStats = buildItemStats(
+            store["item_popularity"], meta["n_train_users"], coldThreshold
+        )
+    if needsGenres:
+        genreMatrix = np.asarray(store["genre_matrix"])
+        trainMatrix = scipy.sparse.csr_matrix(
+            (
+                np.ones(len(store["train"][1]), dtype=np.float32),
+                store["train"][1],
+                store["train"][0],
+            ),
+            shape=(nUsers, nItems),
+        )
+        userGenreCounts = getUserGenreCounts(
+            trainMatrix, np.arange(nUsers), genreMatrix
+        )
+    # Evaluate the stored lists chunk by chunk
+    sums, coverage = {}, {}
+    for key, rec in store["rec"].items():
+        sums[key] = {code: 0.0 for code in metricCodes if code != "CV"}
+        coverage[key] = set()
+        for start in range(0, nUsers, chunkSize):
+            end = min(start + chunkSize, nUsers)
+            topN = np.asarray(rec[start:end, :top_n])
+            metrics = calculateUserMetrics(
+                topN,
+                gtMatrix[start:end],
+                itemStats,
+                genreMatrix,
+                None if userGenreCounts is None else userGenreCounts[start:end],
+                metricCodes,
+            )
+            for code, values in metrics.items():
+                sums[key][code] += float(np.sum(values))
+            coverage[key].update(np.unique(topN[topN >= 0]).tolist())
+    if "CV" not in metricCodes:
+        coverage = {}
+    return calculateMeanRecMetricsFromSums(sums, nUsers, coverage, nItems, top_n)
+
+
+def buildGroundTruthMatrix(
+    dataFrame: pd.DataFrame, userIds: list, iidMap: dict, returnExtraIds: bool = False
+):
+    """
+    Build a binary (users x items) CSR ground-truth matrix from user-item interactions.
+    [Note]: items unknown to the mapping get extra columns after the known items,
+    so they still count as ground truth but can never be hit by a recommendation.
+
+    Parameters
+    ----------
+    dataFrame: pd.DataFrame
+        The DataFrame containing the 'user_id' and 'item_id' ground-truth interactions.
+    userIds: list
+        The raw user IDs defining the order of the rows.
+    iidMap: dict
+        A mapping from raw item IDs to their indices in the training dataset.
+    returnExtraIds: bool, optional
+        Whether to also return the raw IDs of the extra (unknown item) columns.
+
+    Returns
+    -------
+    gtMatrix: scipy.sparse.csr_matrix
+        The binary ground-truth matrix with one row per given user.
+    extraIds: list
+        The raw item IDs of the extra columns (only if 'returnExtraIds' is True).
+    """
+    # Variables
+    nItems = len(iidMap)
+    rowMap = {uid: row for row, uid in enumerate(userIds)}
+    rows = dataFrame["user_id"].map(rowMap)
+    cols = dataFrame["item_id"].map(iidMap)
+    # Keep only the interactions of the given users
+    keep = rows.notna().to_numpy()
+    rows, cols = rows[keep].to_numpy(np.int64), cols[keep]
+    # Give the unknown items their own columns
+    unknown = cols.isna().to_numpy()
+    codes, extraIds = pd.factorize(dataFrame["item_id"][keep][unknown])
+    cols = cols.to_numpy(np.float64, copy=True)
+    cols[unknown] = nItems + codes
+    gtMatrix = scipy.sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols.astype(np.int64))),
+        shape=(len(userIds), nItems + len(extraIds)),
+    )
+    # Duplicated interactions are counted once
+    gtMatrix.sum_duplicates()
+    gtMatrix.data[:] = 1
+    if returnExtraIds:
+        return gtMatrix, extraIds.tolist()
+    return gtMatrix
+
+
+def calculateHitMatrix(
+    topN: np.ndarray, gtMatrix: scipy.sparse.csr_matrix
+) -> np.ndarray:
+    """
+    Find which recommended items are relevant, for all users at once.
+
+    Parameters
+    ----------
+    topN: np.ndarray
+        A (users x N) array of recommended item indices, padded with -1.
+    gtMatrix: scipy.sparse.csr_matrix
+        A binary (users x items) ground-truth matrix.
+
+    Returns
+    -------
+    hits: np.ndarray
+        A (users x N) boolean array, True where the recommended item is relevant.
+    """
+    # Variables
+    hits = np.zeros(topN.shape, dtype=bool)
+    rows, ranks = np.nonzero(topN >= 0)
+    if len(rows) == 0:
+        return hits
+    # Store the rank (+1) of each recommendation in a sparse matrix
+    recMatrix = scipy.sparse.csr_matrix(
+        (ranks + 1, (rows, topN[rows, ranks])), shape=gtMatrix.shape
+    )
+    # Keep only the recommended items present in the ground truth
+    matched = recMatrix.multiply(gtMatrix > 0).tocoo()
+    hits[matched.row, matched.data.astype(np.int64) - 1] = True
+    return hits
+
+
+def calculateRankingMetrics(
+    topN: np.ndarray, gtMatrix: scipy.sparse.csr_matrix, idcgAtN: bool = False
+) -> dict:
+    """
+    Calculate NDCG, Recall, Precision, MAP and HitRate for all users in one pass.
+    [Note]: 'HR' counts the relevant items in each list, as in the per-user records.
+
+    Parameters
+    ----------
+    topN: np.ndarray
+        A (users x N) array of recommended item indices, padded with -1.
+    gtMatrix: scipy.sparse.csr_matrix
+        A binary (users x items) ground-truth matrix aligned with the rows of topN.
+    idcgAtN: bool, optional
+        Whether to cut the ideal DCG at N (default is False, using the whole ground truth).
+
+    Returns
+    -------
+    dict
+        A dictionary of per-user float arrays keyed by 'ND', 'RC', 'PR', 'AP' and 'HR'.
+    """
+    # Variables
+    N = topN.shape[1]
+    hits = calculateHitMatrix(topN, gtMatrix)
+    gtCount = np.diff(gtMatrix.indptr)
+    recCount = (topN >= 0).sum(axis=1)
+    hitCount = hits.sum(axis=1)
+    # Rank discounts and per-user IDCG lookup table
+    discount = 1.0 / np.log2(np.arange(2, N + 2))
+    idcgLen = np.minimum(gtCount, N) if idcgAtN else gtCount
+    idcgTable = np.concatenate(
+        ([0.0], np.cumsum(1.0 / np.log2(np.arange(2, idcgLen.max(initial=0) + 2))))
+    )
+    dcg = hits @ discount
+    idcg = idcgTable[idcgLen]
+    # Cumulative hits give the precision at each relevant rank
+    cumHits = np.cumsum(hits, axis=1)
+    apSum = (hits * cumHits / np.arange(1, N + 1)).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ndcg = np.where(idcg > 0, dcg / idcg, 0.0)
+        recall = np.where(gtCount > 0, hitCount / gtCount, 0.0)
+        precision = np.where(recCount > 0, hitCount / recCount, 0.0)
+        mapScore = apSum / np.maximum(gtCount, 1)
+    return {
+        "ND": ndcg,
+        "RC": recall,
+        "PR": precision,
+        "AP": mapScore,
+        "HR": hitCount,
+    }
+
+
+def calculateDiversityMatrix(
+    topN: np.ndarray, genreMatrix: np.ndarray, blockSize: int = 4096
+) -> np.ndarray:
+    """
+    Calculate the Intra-List Diversity (ILD) of all recommendation lists at once.
+    [Note] It is the average genre Jaccard dissimilarity over the pairs of recommended items.
+
+    Parameters
+    ----------
+    topN: np.ndarray
+        A (users x N) array of recommended item indices, padded with -1.
+    genreMatrix: np.ndarray
+        A (items x genres) multi-hot matrix of item genres.
+    blockSize: int, optional
+        The number of lists processed together (default is 4096).
+
+    Returns
+    -------
+    diversity: np.ndarray
+        The ILD of each list, 0.0 for lists with one or fewer items.
+    """
+    # Variables
+    N = topN.shape[1]
+    diversity = np.zeros(topN.shape[0], dtype=np.float64)
+    binary = (genreMatrix > 0).astype(np.float32)
+    upper = np.triu(np.ones((N, N), dtype=bool), k=1)
+    for start in range(0, topN.shape[0], blockSize):
+        block = topN[start : start + blockSize]
+        valid = block >= 0
+        # Gather the genres of the lists and intersect all item pairs
+        genres = binary[np.maximum(block, 0)] * valid[..., None]
+        inter = genres @ genres.transpose(0, 2, 1)
+        sizes = genres.sum(axis=2)
+        union = sizes[:, :, None] + sizes[:, None, :] - inter
+        # Items without any genre are identical to each other
+        similarity = np.divide(
+            inter, union, out=np.ones_like(inter), where=union > 0
+        )
+        pairs = valid[:, :, None] & valid[:, None, :] & upper
+        nPairs = pairs.sum(axis=(1, 2))
+        total = ((1 - similarity) * pairs).sum(axis=(1, 2))
+        diversity[start : start + len(block)] = np.divide(
+            total, nPairs, out=np.zeros_like(total, dtype=np.float64), where=nPairs > 0
+        )
+    return diversity
+
+
+def getUserGenreCounts(
+    seenMatrix: scipy.sparse.csr_matrix, userIdx: np.ndarray, genreMatrix: np.ndarray
+) -> np.ndarray:
+    """
+    Count the genres in the history of the given users with one sparse matmul.
+    [Note]: items without genres (the last column of 'genreMatrix') are not counted.
+
+    Parameters
+    ----------
+    seenMatrix: scipy.sparse.csr_matrix
+        A (dataset users x items) matrix of the training interactions.
+    userIdx: np.ndarray
+        The dataset indices of the users, -1 for users without history.
+    genreMatrix: np.ndarray
+        A (items x genres) multi-hot matrix of item genres.
+
+    Returns
+    -------
+    np.ndarray
+        A (users x genres) array counting the genres in each user's history.
+    """
+    userSeen = getUserRows(seenMatrix, userIdx).astype(np.float32)
+    historyGenreMatrix = genreMatrix.copy()
+    historyGenreMatrix[:, -1] = 0
+    return np.asarray(userSeen @ historyGenreMatrix)
+
+
+def calculateCalibrationMatrix(
+    topN: np.ndarray,
+    userGenreCounts: np.ndarray,
+    genreMatrix: np.ndarray,
+    eps: float = 1e-8,
+) -> np.ndarray:
+    """
+    Calculate the calibration bias (KL-Divergence between the genre distribution of the
+    users' history and of their recommendations) of all recommendation lists at once.
+    [Note]: as in 'calculateKLDiv', only genres present in either distribution are considered.
+
+    Parameters
+    ----------
+    topN: np.ndarray
+        A (users x N) array of recommended item indices, padded with -1.
+    userGenreCounts: np.ndarray
+        A (users x genres) array counting the genres in each user's history.
+    genreMatrix: np.ndarray
+        A (items x genres) multi-hot matrix of item genres.
+    eps: float, optional
+        A small value used for genres missing from one distribution, default is 1e-8.
+
+    Returns
+    -------
+    calibration: np.ndarray
+        The KL-Divergence of each list (0.0 if both are empty, inf if only one is).
+    """
+    # Genre counts of the recommendation lists in one sparse matmul
+    rows, ranks = np.nonzero(topN >= 0)
+    recMatrix = scipy.sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, topN[rows, ranks])),
+        shape=(topN.shape[0], genreMatrix.shape[0]),
+    )
+    recCounts = np.asarray(recMatrix @ genreMatrix, dtype=np.float64)
+    userCounts = np.asarray(userGenreCounts, dtype=np.float64)
+    # Restrict both distributions to their union of genres
+    pHas, qHas = userCounts > 0, recCounts > 0
+    keys = pHas | qHas
+    pVec = np.where(pHas, userCounts, eps) * keys
+    qVec = np.where(qHas, recCounts, eps) * keys
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pVec /= pVec.sum(axis=1, keepdims=True)
+        qVec /= qVec.sum(axis=1, keepdims=True)
+        calibration = np.where(keys, pVec * np.log(pVec / qVec), 0.0).sum(axis=1)
+    # Handle the empty distributions
+    pEmpty, qEmpty = ~pHas.any(axis=1), ~qHas.any(axis=1)
+    calibration[pEmpty & qEmpty] = 0.0
+    calibration[pEmpty ^ qEmpty] = np.inf
+    calibration[np.isnan(calibration)] = np.inf
+    if (pEmpty ^ qEmpty).any():
+        print(
+            f"- [Warn] {(pEmpty ^ qEmpty).sum()} lists have one empty genre distribution. Returning their KL-Divergence as inf ..."
+        )
+    return calibration
+
+
+def getItemStats(trainSet, coldThreshold: int = 5) -> dict:
+    """
+    Precompute the per-item statistics used by the beyond-accuracy metrics.
+    All arrays are indexed by the item indices of the training dataset.
+
+    Parameters
+    ----------
+    trainSet: cornac.data.Dataset
+        The training dataset object containing user-item interactions.
+    coldThreshold: int, optional
+        The maximum number of interactions for an item to be considered cold (default is 5).
+
+    Returns
+    -------
+    itemStats: dict
+        A dictionary with the 'popularity' counts, the 'popularity_norm' (divided by
+        the maximum), the 'self_info' (-log2 of the popularity ratio among users),
+        the boolean 'cold_mask' (and its 'cold_threshold'), and the 'n_users' and
+        'n_items' of the dataset.
+    """
+    # Count the interactions of each item at once
+    itemIdx = np.asarray(trainSet.uir_tuple[1], dtype=np.int64)
+    popularity = np.bincount(itemIdx, minlength=trainSet.num_items)
+    return buildItemStats(popularity, trainSet.num_users, coldThreshold)
+
+
+def buildItemStats(popularity: np.ndarray, nUsers: int, coldThreshold: int = 5) -> dict:
+    """
+    Derive the per-item statistics used by the beyond-accuracy metrics from the
+    interaction counts of the items (e.g., as persisted in a recommendation list store).
+
+    Parameters
+    ----------
+    popularity: np.ndarray
+        The number of training interactions of each item.
+    nUsers: int
+        The number of users of the training dataset.
+    coldThreshold: int, optional
+        The maximum number of interactions for an item to be considered cold (default is 5).
+
+    Returns
+    -------
+    itemStats: dict
+        The item statistics dictionary (see 'getItemStats'), plus the 'cold_threshold'.
+    """
+    popularity = np.asarray(popularity, dtype=np.float64)
+    maxPopularity = popularity.max(initial=0)
+    itemStats = {
+        "popularity": popularity,
+        "popularity_norm": popularity / maxPopularity if maxPopularity else popularity,
+        "self_info": -np.log2(np.maximum(popularity, 1) / max(nUsers, 1)),
+        "cold_mask": popularity <= coldThreshold,
+        "cold_threshold": coldThreshold,
+        "n_users": nUsers,
+        "n_items": len(popularity),
+    }
+    return itemStats
+
+
+def calculateBeyondAccuracyMetrics(topN: np.ndarray, itemStats: dict) -> dict:
+    """
+    Calculate Cold-start Rate, Popularity Bias, Fairness (1 - Gini) and Novelty
+    of all recommendation lists at once, by gathering the precomputed item statistics.
+
+    Parameters
+    ----------
+    topN: np.ndarray
+        A (users x N) array of recommended item indices, padded with -1.
+    itemStats: dict
+        The item statistics dictionary prepared by 'getItemStats'.
+
+    Returns
+    -------
+    dict
+        A dictionary of per-user float arrays keyed by 'CR', 'PB', 'FA' and 'NO'.
+    """
+    # Variables
+    valid = topN >= 0
+    items = np.maximum(topN, 0)
+    count = valid.sum(axis=1)
+    nonEmpty = np.maximum(count, 1)
+    # Gather the statistics of the recommended items
+    coldRate = (itemStats["cold_mask"][items] & valid).sum(axis=1) / nonEmpty
+    popBias = (itemStats["popularity_norm"][items] * valid).sum(axis=1) / nonEmpty
+    novelty = (itemStats["self_info"][items] * valid).sum(axis=1) / nonEmpty
+    # Gini of the popularity of each list (padding sorted to the end)
+    popularity = np.sort(np.where(valid, itemStats["popularity"][items], np.inf), axis=1)
+    popularity = np.where(np.isfinite(popularity), popularity, 0.0)
+    popSum = popularity.sum(axis=1)
+    cum = popularity @ np.arange(1, topN.shape[1] + 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gini = np.where(
+            popSum > 0, 2 * cum / (nonEmpty * popSum) - (nonEmpty + 1) / nonEmpty, 0.0
+        )
+    return {
+        "CR": coldRate,
+        "PB": popBias,
+        "FA": 1 - gini,
+        "NO": novelty,
+    }
+
+
+def calculateUserMetrics(
+    topN: np.ndarray,
+    gtMatrix: scipy.sparse.csr_matrix,
+    itemStats: dict,
+    genreMatrix: np.ndarray,
+    userGenreCounts: np.ndarray,
+    metricCodes: list = None,
+) -> dict:
+    """
+    Calculate the per-user metrics of a block of recommendation lists.
+    [Note]: only the inputs of the requested metric groups are used (others may be None).
+
+    Parameters
+    ----------
+    topN: np.ndarray
+        A (users x N) array of recommended item indices, padded with -1.
+    gtMatrix: scipy.sparse.csr_matrix
+        A binary (users x items) ground-truth matrix aligned with the rows of topN.
+    itemStats: dict
+        The item statistics dictionary prepared by 'getItemStats'.
+    genreMatrix: np.ndarray
+        A (items x genres) multi-hot matrix of item genres.
+    userGenreCounts: np.ndarray
+        A (users x genres) array counting the genres in each user's history.
+    metricCodes: list, optional
+        The codes of the metrics to calculate (default is all per-user metrics).
+
+    Returns
+    -------
+    metrics: dict
+        A dictionary of per-user float arrays keyed by metric code.
+    """
+    # Variables
+    metrics = {}
+    codes = [c for c in METRIC_NAMES if c != "CV"] if metricCodes is None else metricCodes
+    # Calculate only the requested metric groups
+    if any(code in codes for code in ["ND", "RC", "PR", "AP", "HR"]):
+        metrics.update(calculateRankingMetrics(topN, gtMatrix))
+    if any(code in codes for code in ["CR", "PB", "FA", "NO"]):
+        metrics.update(calculateBeyondAccuracyMetrics(topN, itemStats))
+    if "DI" in codes:
+        metrics["DI"] = calculateDiversityMatrix(topN, genreMatrix)
+    if "CB" in codes:
+        metrics["CB"] = calculateCalibrationMatrix(topN, userGenreCounts, genreMatrix)
+    return {code: metrics[code] for code in codes if code in metrics}
@@ -0,0 +1,187 @@
+import numpy as np
+import scipy.sparse
+
+
+def scoreUserBlock(model, userIdx: np.ndarray, nItems: int) -> np.ndarray:
+    """
+    Score all items for a block of users and stack the results as a 2-D array.
+    [Note]: rows of unknown users (index < 0) are filled with negative infinity.
+
+    Parameters
+    ----------
+    model: object
+        The fitted recommendation model used to score items.
+    userIdx: np.ndarray
+        The internal (model) indices of the users in the block.
+    nItems: int
+        The number of items known by the model.
+
+    Returns
+    -------
+    scores: np.ndarray
+        A (users x items) float32 array containing the scores.
+    """
+    scores = np.full((len(userIdx), nItems), -np.inf, dtype=np.float32)
+    for row, uidx in enumerate(userIdx):
+        if uidx < 0:
+            continue
+        scores[row] = model.score(int(uidx))
+    return scores
+
+
+def rankTopN(
+    scores: np.ndarray, seenBlock: scipy.sparse.csr_matrix, N: int, useGpu=False
+) -> np.ndarray:
+    """
+    Mask the seen items of a block of users and select their top-N items.
+    [Note]: the given scores array is modified in place (seen items set to -inf).
+
+    Parameters
+    ----------
+    scores: np.ndarray
+        A (users x items) array containing the scores of the block.
+    seenBlock: scipy.sparse.csr_matrix
+        A (users x items) sparse matrix with the already interacted items of the block.
+    N: int
+        The number of top recommendations to return.
+    useGpu: bool, optional
+        Flag indicating whether to rank on GPU using CuPy (default is False).
+
+    Returns
+    -------
+    top: np.ndarray
+        A (users x N) int32 array of item indices sorted by descending score
+        (ties by ascending item index), padded with -1 where fewer than N
+        candidates are available.
+    """
+    # Variables
+    nUsers, nItems = scores.shape
+    top = np.full((nUsers, N), -1, dtype=np.int32)
+    n = min(N, nItems)
+    if nUsers == 0 or n == 0:
+        return top
+    xp = np
+    if useGpu:
+        import cupy as cp
+
+        xp = cp
+        scores = cp.asarray(scores)
+    # Mask the seen items in a single step
+    if seenBlock is not None and seenBlock.nnz > 0:
+        rows = np.repeat(np.arange(nUsers), np.diff(seenBlock.indptr))
+        scores[xp.asarray(rows), xp.asarray(seenBlock.indices)] = -xp.inf
+    # Unscored (NaN) items rank last like masked ones
+    scores[xp.isnan(scores)] = -xp.inf
+    # Select the top-N candidates and sort only them
+    if n < nItems:
+        # Items tied with the n-th score are taken by ascending item index
+        part = xp.argpartition(-scores, n - 1, axis=1)[:, :n]
+        kth = xp.take_along_axis(scores, part, axis=1).min(axis=1, keepdims=True)
+        above = scores > kth
+        ties = scores == kth
+        need = n - above.sum(axis=1, keepdims=True)
+        chosen = above | (ties & (xp.cumsum(ties, axis=1) <= need))
+        part = xp.nonzero(chosen)[1].reshape(nUsers, n)
+    else:
+        part = xp.broadcast_to(xp.arange(nItems), (nUsers, nItems))
+    # Candidates are in item order, so a stable sort breaks ties by item index
+    partScores = xp.take_along_axis(scores, part, axis=1)
+    order = xp.argsort(-partScores, axis=1, kind="stable")
+    part = xp.take_along_axis(part, order, axis=1)
+    partScores = xp.take_along_axis(partScores, order, axis=1)
+    # Seen or unscored candidates are not recommendable
+    part = xp.where(partScores > -xp.inf, part, -1)
+    if useGpu:
+        part = xp.asnumpy(part)
+    top[:, :n] = part
+    return top
+
+
+def getTopNMatrix(
+    model,
+    userIdx: np.ndarray,
+    N: int,
+    seenMatrix: scipy.sparse.csr_matrix,
+    blockSize: int = 512,
+    useGpu: bool = False,
+) -> np.ndarray:
+    """
+    Get the top-N recommendations of many users by ranking them block by block.
+
+    Parameters
+    ----------
+    model: object
+        The fitted recommendation model used to score items.
+    userIdx: np.ndarray
+        The internal (model) indices of the users, -1 for users unknown to the model.
+    N: int
+        The number of top recommendations to return per user.
+    seenMatrix: scipy.sparse.csr_matrix
+        A (model users x items) sparse matrix of already interacted items.
+    blockSize: int, optional
+        The number of users scored together in each block (default is 512).
+    useGpu: bool, optional
+        Flag indicating whether to rank on GPU using CuPy (default is False).
+
+    Returns
+    -------
+    topN: np.ndarray
+        A (users x N) int32 array of item indices, padded with -1.
+    """
+    # Variables
+    userIdx = np.asarray(userIdx, dtype=np.int64)
+    nItems = seenMatrix.shape[1]
+    topN = np.full((len(userIdx), N), -1, dtype=np.int32)
+    blockSize = max(1, int(blockSize))
+    # Rank the users block by block
+    for start in range(0, len(userIdx), blockSize):
+        block = userIdx[start : start + blockSize]
+        scores = scoreUserBlock(model, block, nItems)
+        # Rows of unknown users are all -inf already, so any mask is harmless
+        seenBlock = seenMatrix[np.maximum(block, 0)]
+        topN[start : start + len(block)] = rankTopN(scores, seenBlock, N, useGpu)
+    return topN
+
+
+def getUserIndices(userIds, uidMap: dict) -> np.ndarray:
+    """
+    Map raw user IDs to the internal indices of a dataset.
+
+    Parameters
+    ----------
+    userIds: list
+        The raw user IDs.
+    uidMap: dict
+        A mapping from raw user IDs to their indices in the dataset.
+
+    Returns
+    -------
+    np.ndarray
+        An int64 array of user indices, -1 for users not present in the mapping.
+    """
+    return np.fromiter((uidMap.get(u, -1) for u in userIds), dtype=np.int64)
+
+
+def getUserRows(matrix: scipy.sparse.csr_matrix, userIdx: np.ndarray):
+    """
+    Select the (binarized) rows of the given users from a user-item matrix.
+
+    Parameters
+    ----------
+    matrix: scipy.sparse.csr_matrix
+        A (dataset users x items) interaction matrix.
+    userIdx: np.ndarray
+        The dataset indices of the users, -1 for users not in the dataset.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        A binary (users x items) matrix, with empty rows for unknown users.
+    """
+    userIdx = np.asarray(userIdx)
+    rows = scipy.sparse.diags((userIdx >= 0).astype(np.int8), dtype=np.int8) @ (
+        matrix[np.maximum(userIdx, 0)] != 0
+    ).astype(np.int8)
+    rows = scipy.sparse.csr_matrix(rows)
+    rows.eliminate_zeros()
+    return rows
@@ -0,0 +1,245 @@
+import os
+import json
+import copy
+import pickle
+import hashlib
+import numpy as np
+from datetime import datetime
+
+# Version of the on-disk model registry layout
+REGISTRY_VERSION = 1
+
+
+def _hashArray(hasher, array):
+    """
+    Feed the dtype, shape and bytes of an array into a hash object.
+    """
+    array = np.ascontiguousarray(array)
+    hasher.update(f"{array.dtype.str}{array.shape}".encode())
+    if array.dtype == object:
+        hasher.update(repr(array.tolist()).encode())
+    else:
+        hasher.update(array.tobytes())
+
+
+def getDataFingerprint(trainSet) -> str:
+    """
+    Fingerprint a training dataset by its user/item IDs and interactions.
+
+    Parameters
+    ----------
+    trainSet: cornac.data.Dataset
+        The training dataset object containing user-item interactions.
+
+    Returns
+    -------
+    str
+        The SHA-1 hex digest of the dataset.
+    """
+    hasher = hashlib.sha1()
+    _hashArray(hasher, np.asarray([str(u) for u in trainSet.user_ids], dtype=object))
+    _hashArray(hasher, np.asarray([str(i) for i in trainSet.item_ids], dtype=object))
+    for array in trainSet.uir_tuple:
+        _hashArray(hasher, np.asarray(array))
+    return hasher.hexdigest()
+
+
+def getModalityFingerprint(*modalities) -> str:
+    """
+    Fingerprint the item features of the given modalities (None ones are skipped).
+
+    Parameters
+    ----------
+    *modalities: cornac.data.FeatureModality
+        The (image or feature) modalities used to fit a model.
+
+    Returns
+    -------
+    str
+        The SHA-1 hex digest of the modalities, or 'none' if no modality is given.
+    """
+    modalities = [m for m in modalities if m is not None]
+    if not modalities:
+        return "none"
+    hasher = hashlib.sha1()
+    for modality in modalities:
+        _hashArray(hasher, np.asarray([str(i) for i in modality.ids], dtype=object))
+        _hashArray(hasher, np.asarray(modality.features))
+    return hasher.hexdigest()
+
+
+def saveModel(
+    registryPath: str,
+    key: tuple,
+    model,
+    params: dict,
+    dataFingerprint: str,
+    modalityFingerprint: str = "none",
+) -> str:
+    """
+    Save a fitted model into the registry. Its learned arrays are stored as '.npy' files
+    (memory-mappable), and the rest of the model (without its datasets) is pickled.
+
+    Parameters
+    ----------
+    registryPath: str
+        The directory of the registry (created if missing).
+    key: tuple
+        The (model, scenario) key of the model.
+    model: cornac.models.Recommender
+        The fitted model.
+    params: dict
+        The hyper-parameters of the model.
+    dataFingerprint: str
+        The fingerprint of the training dataset (see 'getDataFingerprint').
+    modalityFingerprint: str, optional
+        The fingerprint of the modalities (see 'getModalityFingerprint', default is 'none').
+
+    Returns
+    -------
+    modelPath: str
+        The directory of the saved model, or None if the model could not be saved.
+    """
+    # Variables
+    mdl, scn = key
+    modelPath = os.path.join(registryPath, f"{mdl}_{scn}")
+    ignored = set(getattr(model, "ignored_attrs", [])) | {"train_set", "val_set"}
+    os.makedirs(modelPath, exist_ok=True)
+    # Split the learned arrays from the rest of the model
+    arrays = {
+        name: value
+        for name, value in vars(model).items()
+        if isinstance(value, np.ndarray) and value.ndim > 0 and value.dtype != object
+    }
+    shell = copy.copy(model)
+    for name in ignored | set(arrays):
+        if name in vars(shell):
+            setattr(shell, name, None)
+    try:
+        with open(os.path.join(modelPath, "model.pkl"), "wb") as modelFile:
+            pickle.dump(shell, modelFile, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        print(f"- [Warn] Could not save model '{mdl}' ({scn}) into the registry: {e}")
+        return None
+    for name, value in arrays.items():
+        np.save(os.path.join(modelPath, f"{name}.npy"), value)
+    # Save the metadata
+    meta = {
+        "version": REGISTRY_VERSION,
+        "model": mdl,
+        "scenario": scn,
+        "class": f"{type(model).__module__}.{type(model).__name__}",
+        "params": params,
+        "data_fingerprint": dataFingerprint,
+        "modality_fingerprint": modalityFingerprint,
+        "arrays": sorted(arrays),
+        "saved_at": datetime.now().isoformat(timespec="microseconds"),
+    }
+    with open(os.path.join(modelPath, "meta.json"), "w") as metaFile:
+        json.dump(meta, metaFile, indent=2, default=str)
+    return modelPath
+
+
+def loadModel(modelPath: str, mmapMode: str = "c"):
+    """
+    Load a model saved by 'saveModel', memory-mapping its learned arrays.
+    [Note]: the default copy-on-write mode keeps the arrays writable for Cornac's scoring.
+
+    Parameters
+    ----------
+    modelPath: str
+        The directory of the saved model.
+    mmapMode: str, optional
+        The memory-map mode of the arrays ('c' by default, None to read them in memory).
+
+    Returns
+    -------
+    model: cornac.models.Recommender
+        The loaded model.
+    meta: dict
+        The metadata of the model (hyper-parameters and fingerprints).
+    """
+    with open(os.path.join(modelPath, "meta.json")) as metaFile:
+        meta = json.load(metaFile)
+    with open(os.path.join(modelPath, "model.pkl"), "rb") as modelFile:
+        model = pickle.load(modelFile)
+    for name in meta["arrays"]:
+        path = os.path.join(modelPath, f"{name}.npy")
+        setattr(model, name, np.load(path, mmap_mode=mmapMode))
+    return model, meta
+
+
+def loadModels(
+    registryPath: str, dataFingerprint: str = None, modalityFingerprints: dict = None
+) -> dict:
+    """
+    Load all models of a registry, skipping the ones fitted on other data.
+
+    Parameters
+    ----------
+    registryPath: str
+        The directory of the registry.
+    dataFingerprint: str, optional
+        The expected fingerprint of the training dataset (default is no check).
+    modalityFingerprints: dict, optional
+        The expected modality fingerprints keyed by (model, scenario) (default is no check).
+
+    Returns
+    -------
+    models: dict
+        A dictionary mapping (model, scenario) to the loaded models.
+    """
+    # Variables
+    models = {}
+    if not os.path.isdir(registryPath):
+        print(
+            f"- [Warn] Model registry '{registryPath}' not found! Returning no models ..."
+        )
+        return models
+    for name in sorted(os.listdir(registryPath)):
+        modelPath = os.path.join(registryPath, name)
+        metaPath = os.path.join(modelPath, "meta.json")
+        if not os.path.exists(metaPath):
+            continue
+        with open(metaPath) as metaFile:
+            meta = json.load(metaFile)
+        key = (meta["model"], meta["scenario"])
+        # Check the fingerprints
+        if dataFingerprint is not None and meta["data_fingerprint"] != dataFingerprint:
+            print(f"- [Warn] Model '{key}' was fitted on other data! Skipping it ...")
+            continue
+        expected = (modalityFingerprints or {}).get(key)
+        if expected is not None and meta["modality_fingerprint"] != expected:
+            print(
+                f"- [Warn] Model '{key}' was fitted on other modalities! Skipping it ..."
+            )
+            continue
+        models[key], _ = loadModel(modelPath)
+    print(f"- Loaded {len(models)} models from the registry '{registryPath}'!")
+    return models
+
+
+def getRegistryVersion(registryPath: str) -> str:
+    """
+    Get the version of a registry, which changes whenever any of its models is saved.
+
+    Parameters
+    ----------
+    registryPath: str
+        The directory of the registry.
+
+    Returns
+    -------
+    str
+        The SHA-1 hex digest of the metadata of all registered models.
+    """
+    hasher = hashlib.sha1()
+    if not os.path.isdir(registryPath):
+        return hasher.hexdigest()
+    for name in sorted(os.listdir(registryPath)):
+        metaPath = os.path.join(registryPath, name, "meta.json")
+        if os.path.exists(metaPath):
+            with open(metaPath, "rb") as metaFile:
+                hasher.update(name.encode())
+                hasher.update(metaFile.read())
+    return hasher.hexdigest()
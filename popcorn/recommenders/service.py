@@ -0,0 +1,371 @@
+import json
+import time
+import queue
+import threading
+import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from popcorn.recommenders.ranking import getTopNMatrix
+from popcorn.recommenders.registry import (
+    loadModels,
+    getDataFingerprint,
+    getRegistryVersion,
+)
+
+# Number of recent request latencies kept for the percentile counters
+LATENCY_WINDOW = 10000
+
+
+class Recommender:
+    """
+    A long-lived recommendation service over the final (registered) models.
+    Concurrent top-N requests are coalesced into micro-batches ranked together by a
+    background thread, and the per-user top-N lists are kept in an LRU cache that is
+    invalidated whenever the models change.
+
+    Parameters
+    ----------
+    config: dict
+        The configuration dictionary containing experiment settings.
+    trainSet: cornac.data.Dataset
+        The training dataset object (user/item mappings and seen items to mask).
+    models: dict, optional
+        A dictionary mapping (model, scenario) to fitted models (default is loading
+        the models fitted on the same data from the model registry).
+    """
+
+    def __init__(self, config: dict, trainSet, models: dict = None):
+        # Variables
+        topN = config["recommender"]["top_n"]
+        serviceCfg = config["recommender"]["service"]
+        self.depth = max(topN) if isinstance(topN, (list, tuple)) else topN
+        self.batchSize = config["recommender"]["batch_size"]
+        self.registryPath = config["recommender"]["registry_path"]
+        self.maxWait = serviceCfg["max_wait_ms"] / 1000.0
+        self.cacheSize = serviceCfg["cache_size"]
+        self.host, self.port = serviceCfg["host"], serviceCfg["port"]
+        self.timeout = serviceCfg["timeout_s"]
+        self.uidMap = trainSet.uid_map
+        self.itemIds = np.asarray(trainSet.item_ids)
+        self.seenMatrix = trainSet.csr_matrix
+        self.dataFingerprint = getDataFingerprint(trainSet)
+        # State shared with the batching thread
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._cache = OrderedDict()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counters = {"requests": 0, "cache_hits": 0, "batches": 0, "ranked": 0}
+        self._startTime = time.perf_counter()
+        self._closed = False
+        self.models, self.modelVersion, self.version = {}, None, 0
+        if models:
+            self.setModels(models)
+        else:
+            self.reload()
+        # Start the batching thread
+        self._thread = threading.Thread(target=self._batchLoop, daemon=True)
+        self._thread.start()
+
+    def setModels(self, models: dict, modelVersion: str = None):
+        """
+        Swap the served models and invalidate the cached lists.
+
+        Parameters
+        ----------
+        models: dict
+            A dictionary mapping (model, scenario) to fitted models.
+        modelVersion: str, optional
+            The version of the models (default is a new in-memory version).
+        """
+        with self._lock:
+            self.models = dict(models)
+            self.version += 1
+            self.modelVersion = modelVersion or f"memory-{self.version}"
+            self._cache.clear()
+
+    def reload(self) -> bool:
+        """
+        Reload the models from the registry if its version has changed.
+
+        Returns
+        -------
+        bool
+            True if new models were loaded, False otherwise.
+        """
+        if not self.registryPath:
+            return False
+        registryVersion = getRegistryVersion(self.registryPath)
+        if registryVersion == self.modelVersion:
+            return False
+        models = loadModels(self.registryPath, self.dataFingerprint)
+        if not models:
+            print("- [Warn] No registered models found! Keeping the current ones ...")
+            return False
+        self.setModels(models, registryVersion)
+        return True
+
+    def getUserIndex(self, userId) -> int:
+        """
+        Map a raw user ID (also given as a string, e.g., from a URL) to its index.
+        """
+        uidx = self.uidMap.get(userId)
+        for cast in (int, float):
+            if uidx is not None or not isinstance(userId, str):
+                break
+            try:
+                uidx = self.uidMap.get(cast(userId))
+            except ValueError:
+                continue
+        return -1 if uidx is None else uidx
+
+    def recommend(self, userId, key: tuple = None, n: int = None, timeout=None) -> list:
+        """
+        Get the top-N recommendations of a user (blocking until its micro-batch is ranked).
+
+        Parameters
+        ----------
+        userId: object
+            The raw ID of the user.
+        key: tuple, optional
+            The (model, scenario) key of the model (default is the first served model).
+        n: int, optional
+            The number of recommendations, up to the service depth (default is the depth).
+        timeout: float, optional
+            The maximum number of seconds to wait for the ranking (default is no limit).
+
+        Returns
+        -------
+        list
+            The raw IDs of the recommended items, empty for unknown users.
+
+        Raises
+        ------
+        RuntimeError
+            If the service is closed.
+        """
+        # Variables
+        start = time.perf_counter()
+        key = tuple(key) if key is not None else next(iter(self.models), None)
+        n = self.depth if n is None else min(max(int(n), 0), self.depth)
+        # Check the arguments
+        if key not in self.models:
+            raise KeyError(f"Model '{key}' is not served!")
+        uidx = self.getUserIndex(userId)
+        # Look up the cache, or wait for the user's micro-batch
+        row, future = None, None
+        with self._lock:
+            # (checked under the lock, so no request is queued after the stop signal)
+            if self._closed:
+                raise RuntimeError("The recommendation service is closed!")
+            self._counters["requests"] += 1
+            if uidx >= 0:
+                row = self._cache.get((key, uidx))
+                if row is not None:
+                    self._cache.move_to_end((key, uidx))
+                    self._counters["cache_hits"] += 1
+                else:
+                    future = Future()
+                    self._queue.put((key, uidx, future))
+        if future is not None:
+            row = future.result(timeout)
+        items = [] if row is None else self.itemIds[row[:n][row[:n] >= 0]].tolist()
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+        return items
+
+    def _batchLoop(self):
+        """
+        Collect the queued requests into micro-batches and rank them.
+        """
+        while True:
+            batch = [self._queue.get()]
+            if batch[0] is None:
+                return
+            # Wait a little for concurrent requests to join the batch
+            deadline = time.perf_counter() + self.maxWait
+            while len(batch) < self.batchSize:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                if batch[-1] is None:
+                    batch.pop()
+                    self._queue.put(None)
+                    break
+            # Failures outside the ranking pass are reported to the pending requests
+            try:
+                self._rankBatch(batch)
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _rankBatch(self, batch: list):
+        """
+        Rank a micro-batch of requests, one matrix ranking pass per model.
+        """
+        # Variables
+        with self._lock:
+            models, version = self.models, self.version
+        requests = {}
+        for key, uidx, future in batch:
+            requests.setdefault(key, []).append((uidx, future))
+        for key, keyRequests in requests.items():
+            try:
+                userIdx = np.unique([uidx for uidx, _ in keyRequests])
+                topN = getTopNMatrix(
+                    models[key], userIdx, self.depth, self.seenMatrix, self.batchSize
+                )
+            except Exception as e:
+                for _, future in keyRequests:
+                    future.set_exception(e)
+                continue
+            rows = {int(uidx): row for uidx, row in zip(userIdx, topN)}
+            with self._lock:
+                self._counters["batches"] += 1
+                self._counters["ranked"] += len(userIdx)
+                # Lists ranked by replaced models are not cached
+                if version == self.version:
+                    for uidx, row in rows.items():
+                        self._cache[(key, uidx)] = row
+                        self._cache.move_to_end((key, uidx))
+                    while len(self._cache) > self.cacheSize:
+                        self._cache.popitem(last=False)
+            for uidx, future in keyRequests:
+                future.set_result(rows[uidx])
+
+    def getStats(self) -> dict:
+        """
+        Get the latency and throughput counters of the service.
+
+        Returns
+        -------
+        dict
+            The request, cache and batch counters, the latency (ms) mean, percentiles
+            and maximum over the recent requests, and the throughput (requests/s).
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = np.asarray(self._latencies) * 1000.0
+            cached = len(self._cache)
+        uptime = time.perf_counter() - self._startTime
+        hasLatency = len(latencies) > 0
+        return {
+            **counters,
+            "cache_hit_rate": counters["cache_hits"] / max(counters["requests"], 1),
+            "mean_batch_size": counters["ranked"] / max(counters["batches"], 1),
+            "cached_lists": cached,
+            "latency_ms_mean": float(latencies.mean()) if hasLatency else 0.0,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if hasLatency else 0.0,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if hasLatency else 0.0,
+            "latency_ms_max": float(latencies.max()) if hasLatency else 0.0,
+            "throughput_rps": counters["requests"] / uptime if uptime > 0 else 0.0,
+            "uptime_s": uptime,
+            "model_version": self.modelVersion,
+            "models": [f"{mdl}_{scn}" for mdl, scn in self.models],
+        }
+
+    def close(self):
+        """
+        Stop the batching thread (pending requests are ranked first, new ones are refused).
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+
+def serveRecommender(
+    service: Recommender, host: str = None, port: int = None, block: bool = True
+):
+    """
+    Serve a recommendation service over a local HTTP front-end, with the endpoints:
+    'GET /recommend?user=<id>&model=<model>_<scenario>&n=<n>', 'GET /stats' and
+    'POST /reload' (reloading the registered models if they changed).
+
+    Parameters
+    ----------
+    service: Recommender
+        The recommendation service.
+    host: str, optional
+        The host to bind (default is the configured one).
+    port: int, optional
+        The port to bind (default is the configured one).
+    block: bool, optional
+        Whether to serve until interrupted (default is True), otherwise the server
+        runs in a background thread.
+
+    Returns
+    -------
+    server: ThreadingHTTPServer
+        The HTTP server (stop it with 'server.shutdown()' when not blocking).
+    """
+
+    class RecommenderHandler(BaseHTTPRequestHandler):
+        def reply(self, status: int, body: dict):
+            payload = json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/stats":
+                return self.reply(200, service.getStats())
+            if url.path != "/recommend":
+                return self.reply(404, {"error": f"Unknown endpoint '{url.path}'!"})
+            if "user" not in query:
+                return self.reply(400, {"error": "Missing 'user' parameter!"})
+            key = tuple(query["model"].split("_", 1)) if "model" in query else None
+            try:
+                items = service.recommend(
+                    query["user"], key, query.get("n"), service.timeout
+                )
+            except KeyError as e:
+                return self.reply(404, {"error": str(e.args[0])})
+            except ValueError as e:
+                return self.reply(400, {"error": str(e)})
+            except FutureTimeoutError:
+                return self.reply(504, {"error": "The ranking timed out!"})
+            except RuntimeError as e:
+                return self.reply(503, {"error": str(e)})
+            except Exception as e:
+                return self.reply(500, {"error": str(e)})
+            return self.reply(200, {"user": query["user"], "items": items})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/reload":
+                return self.reply(404, {"error": f"Unknown endpoint '{self.path}'!"})
+            reloaded = service.reload()
+            return self.reply(
+                200, {"reloaded": reloaded, "model_version": service.modelVersion}
+            )
+
+        def log_message(self, format, *args):
+            return
+
+    # Variables
+    host = service.host if host is None else host
+    port = service.port if port is None else port
+    server = ThreadingHTTPServer((host, port), RecommenderHandler)
+    print(f"- Serving recommendations on 'http://{host}:{server.server_port}' ...")
+    if not block:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("- Stopping the recommendation server ...")
+    finally:
+        server.server_close()
+    return server
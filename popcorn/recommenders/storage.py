@@ -0,0 +1,271 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import scipy.sparse
+
+# Version of the on-disk recommendation list store layout
+STORE_VERSION = 1
+
+
+def _saveIds(path: str, ids: list):
+    """
+    Save raw (user or item) IDs, keeping numeric IDs memory-mappable.
+    """
+    ids = np.asarray(ids)
+    np.save(path, ids, allow_pickle=ids.dtype == object)
+
+
+def initRecListStore(
+    storePath: str,
+    userIds: list,
+    itemIds: list,
+    trainMatrix: scipy.sparse.csr_matrix,
+    gtMatrix: scipy.sparse.csr_matrix,
+    modelKeys: list,
+    metricCodes: list,
+    topN: int,
+    itemStats: dict = None,
+    genreMatrix: np.ndarray = None,
+):
+    """
+    Create a columnar recommendation list store, to be filled shard by shard.
+    Each column is a '.npy' file (memory-mappable): the 'train' and 'gt' lists are
+    stored as CSR-like (indptr, items) pairs, each 'rec_{model}_{scenario}' as a
+    (users x N) int32 matrix of item positions (padded with -1), and each metric
+    '{code}_{model}_{scenario}' as a float32 vector. Item positions refer to 'item_ids.npy'.
+    The item popularity and genres are also kept, so metrics can be recalculated offline.
+
+    Parameters
+    ----------
+    storePath: str
+        The directory of the store (created if missing).
+    userIds: list
+        The raw IDs of the evaluated users, in row order.
+    itemIds: list
+        The raw IDs of the items (columns of the train and ground-truth matrices).
+    trainMatrix: scipy.sparse.csr_matrix
+        A binary (users x items) matrix of the users' training items.
+    gtMatrix: scipy.sparse.csr_matrix
+        A binary (users x items) matrix of the users' ground-truth items.
+    modelKeys: list
+        The (model, scenario) tuples to be stored.
+    metricCodes: list
+        The per-user metric codes to be stored (e.g., 'ND', 'RC').
+    topN: int
+        The length of the stored recommendation lists.
+    itemStats: dict, optional
+        The item statistics prepared by 'getItemStats' (its popularity is stored).
+    genreMatrix: np.ndarray, optional
+        The (training items x genres) multi-hot matrix of item genres.
+    """
+    # Variables
+    nUsers = len(userIds)
+    os.makedirs(storePath, exist_ok=True)
+    # Save the static columns
+    _saveIds(os.path.join(storePath, "user_id.npy"), userIds)
+    _saveIds(os.path.join(storePath, "item_ids.npy"), itemIds)
+    for name, matrix in (("train", trainMatrix), ("gt", gtMatrix)):
+        matrix = scipy.sparse.csr_matrix(matrix)
+        matrix.sort_indices()
+        np.save(os.path.join(storePath, f"{name}_indptr.npy"), matrix.indptr.astype(np.int64))
+        np.save(os.path.join(storePath, f"{name}_items.npy"), matrix.indices.astype(np.int32))
+    if itemStats is not None:
+        np.save(os.path.join(storePath, "item_popularity.npy"), itemStats["popularity"])
+    if genreMatrix is not None:
+        np.save(os.path.join(storePath, "genre_matrix.npy"), genreMatrix)
+    # Preallocate the per-model columns on disk
+    for mdl, scn in modelKeys:
+        recFile = np.lib.format.open_memmap(
+            os.path.join(storePath, f"rec_{mdl}_{scn}.npy"),
+            mode="w+",
+            dtype=np.int32,
+            shape=(nUsers, topN),
+        )
+        recFile[:] = -1
+        recFile.flush()
+        del recFile
+        for code in metricCodes:
+            np.lib.format.open_memmap(
+                os.path.join(storePath, f"{code}_{mdl}_{scn}.npy"),
+                mode="w+",
+                dtype=np.float32,
+                shape=(nUsers,),
+            ).flush()
+    # Save the metadata
+    meta = {
+        "version": STORE_VERSION,
+        "n_users": nUsers,
+        "top_n": topN,
+        "models": [list(key) for key in modelKeys],
+        "metrics": list(metricCodes),
+    }
+    if itemStats is not None:
+        meta["n_train_users"] = int(itemStats["n_users"])
+        meta["n_train_items"] = int(itemStats["n_items"])
+        meta["cold_threshold"] = itemStats.get("cold_threshold")
+    with open(os.path.join(storePath, "meta.json"), "w") as metaFile:
+        json.dump(meta, metaFile, indent=2)
+
+
+def writeShardToStore(storePath: str, shard: dict):
+    """
+    Flush the per-user results of an evaluated shard into its rows of the store.
+    [Note]: shards cover disjoint rows, so they can be written by several processes.
+
+    Parameters
+    ----------
+    storePath: str
+        The directory of the store created by 'initRecListStore'.
+    shard: dict
+        The shard dictionary returned by 'evaluateShard'.
+    """
+    # Variables
+    start, end = shard["start"], shard["start"] + shard["count"]
+    # Write the rows of every column of the shard
+    for (mdl, scn), topN in shard["top_n"].items():
+        columns = {f"rec_{mdl}_{scn}": topN}
+        for code, values in shard["metrics"][(mdl, scn)].items():
+            columns[f"{code}_{mdl}_{scn}"] = values
+        for name, values in columns.items():
+            column = np.load(os.path.join(storePath, f"{name}.npy"), mmap_mode="r+")
+            column[start:end] = values
+            column.flush()
+            del column
+
+
+def finalizeRecListStore(storePath: str, coverage: dict):
+    """
+    Record the per-model catalog coverage into the metadata of a filled store.
+
+    Parameters
+    ----------
+    storePath: str
+        The directory of the store.
+    coverage: dict
+        A dictionary mapping (model, scenario) to the coverage ratio of the catalog.
+    """
+    metaPath = os.path.join(storePath, "meta.json")
+    with open(metaPath) as metaFile:
+        meta = json.load(metaFile)
+    meta["coverage"] = [[mdl, scn, float(cov)] for (mdl, scn), cov in coverage.items()]
+    with open(metaPath, "w") as metaFile:
+        json.dump(meta, metaFile, indent=2)
+
+
+def loadRecListStore(storePath: str, mmapMode: str = "r") -> dict:
+    """
+    Load a recommendation list store, memory-mapping its columns by default.
+
+    Parameters
+    ----------
+    storePath: str
+        The directory of the store.
+    mmapMode: str, optional
+        The memory-map mode of the columns ('r' by default, None to read them in memory).
+
+    Returns
+    -------
+    store: dict
+        A dictionary with the 'meta' data, the 'user_id' and 'item_ids' arrays,
+        the 'train' and 'gt' (indptr, items) pairs, the 'item_popularity' and
+        'genre_matrix' arrays (None if not stored), the 'rec' matrices keyed by
+        (model, scenario) and the per-user 'metrics' keyed by (model, scenario) and code.
+    """
+    # Variables
+    with open(os.path.join(storePath, "meta.json")) as metaFile:
+        meta = json.load(metaFile)
+
+    def load(name: str, allowPickle: bool = False):
+        path = os.path.join(storePath, f"{name}.npy")
+        if allowPickle:
+            return np.load(path, allow_pickle=True)
+        return np.load(path, mmap_mode=mmapMode)
+
+    def loadOptional(name: str):
+        if not os.path.exists(os.path.join(storePath, f"{name}.npy")):
+            return None
+        return load(name)
+
+    store = {
+        "meta": meta,
+        "path": storePath,
+        "user_id": load("user_id", allowPickle=True),
+        "item_ids": load("item_ids", allowPickle=True),
+        "train": (load("train_indptr"), load("train_items")),
+        "gt": (load("gt_indptr"), load("gt_items")),
+        "item_popularity": loadOptional("item_popularity"),
+        "genre_matrix": loadOptional("genre_matrix"),
+        "rec": {},
+        "metrics": {},
+    }
+    for mdl, scn in meta["models"]:
+        store["rec"][(mdl, scn)] = load(f"rec_{mdl}_{scn}")
+        store["metrics"][(mdl, scn)] = {
+            code: load(f"{code}_{mdl}_{scn}") for code in meta["metrics"]
+        }
+    return store
+
+
+def recListStoreToFrame(store: dict, start: int = 0, end: int = None) -> pd.DataFrame:
+    """
+    Convert a range of users of a store into the per-user records DataFrame
+    ('user_id', 'train', 'gt', 'rec_*' lists with raw item IDs, and metric columns).
+
+    Parameters
+    ----------
+    store: dict
+        The store dictionary returned by 'loadRecListStore'.
+    start: int, optional
+        The first user row (default is 0).
+    end: int, optional
+        The user row after the last one (default is all users).
+
+    Returns
+    -------
+    pd.DataFrame
+        The per-user records of the requested users.
+    """
+    # Variables
+    end = store["meta"]["n_users"] if end is None else end
+    itemIds = store["item_ids"]
+
+    def toLists(indptr: np.ndarray, items: np.ndarray) -> list:
+        return [
+            itemIds[items[indptr[row] : indptr[row + 1]]].tolist()
+            for row in range(start, end)
+        ]
+
+    records = {
+        "user_id": store["user_id"][start:end].tolist(),
+        "train": toLists(*store["train"]),
+        "gt": toLists(*store["gt"]),
+    }
+    for (mdl, scn), rec in store["rec"].items():
+        rec = np.asarray(rec[start:end])
+        records[f"rec_{mdl}_{scn}"] = [itemIds[row[row >= 0]].tolist() for row in rec]
+        for code, values in store["metrics"][(mdl, scn)].items():
+            records[f"{code}_{mdl}_{scn}"] = np.asarray(values[start:end])
+    # Broadcast the coverage columns
+    for mdl, scn, cov in store["meta"].get("coverage", []):
+        records[f"CV_{mdl}_{scn}"] = cov
+    return pd.DataFrame(records)
+
+
+def exportRecListStoreCsv(store: dict, csvPath: str, chunkSize: int = 10000):
+    """
+    Export a store into the legacy per-user records CSV file, chunk by chunk.
+
+    Parameters
+    ----------
+    store: dict
+        The store dictionary returned by 'loadRecListStore'.
+    csvPath: str
+        The path of the CSV file to be written.
+    chunkSize: int, optional
+        The number of users converted and written at once (default is 10000).
+    """
+    nUsers = store["meta"]["n_users"]
+    for start in range(0, max(nUsers, 1), chunkSize):
+        chunk = recListStoreToFrame(store, start, min(start + chunkSize, nUsers))
+        chunk.to_csv(csvPath, index=False, mode="w" if start == 0 else "a", header=start == 0)
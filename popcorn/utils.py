@@ -1,10 +1,20 @@
+import io
 import re
 import os
 import yaml
 import json
+import time
+import hashlib
+import warnings
+import threading
 import requests
 import numpy as np
 import pandas as pd
+from urllib.parse import urlparse
+from multiprocessing import shared_memory
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 
 
 def readConfigs(configPath: str = "popcorn/config/config.yml") -> dict:
@@ -30,6 +40,8 @@ def readConfigs(configPath: str = "popcorn/config/config.yml") -> dict:
                 print("- Error loading configuration parameters! Exiting ...")
                 return
             print("- Configuration file loaded successfully!")
+            configureUrlCache(configs["general"].get("url_cache"))
+            configureHttpClient(configs["general"].get("http"))
             return configs
         except yaml.YAMLError as err:
             print(f"[Error] Error while reading the configurations: {err}")
@@ -38,6 +50,7 @@ def readConfigs(configPath: str = "popcorn/config/config.yml") -> dict:
 def parseSafe(s: str) -> np.ndarray:
     """
     Converts a string representation of a vector into a NumPy array.
+    [Note]: use 'parseVectorColumn' to convert a whole column at once.
 
     Parameters
     ----------
@@ -55,6 +68,451 @@ def parseSafe(s: str) -> np.ndarray:
     return vec
 
 
+def _tokenizeFloats(text: str, dtype=np.float32) -> np.ndarray:
+    """
+    Tokenize a space-separated string of numbers into an array (None if a token is invalid).
+    """
+    with warnings.catch_warnings():
+        # (NumPy warns about the unparsable tokens before rejecting them)
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            return np.fromstring(text, sep=" ", dtype=dtype)
+        except (ValueError, DeprecationWarning):
+            return None
+
+
+def parseVectorColumn(
+    column: pd.Series,
+    dim: int = None,
+    name: str = None,
+    dtype=np.float32,
+    nanToNum: bool = True,
+) -> tuple:
+    """
+    Converts a whole column of vector strings (elements separated by commas or spaces) into
+    a float32 matrix at once: the strings are joined and tokenized in a single pass, and the
+    non-finite values are replaced by 0.0 (once). Rows with a wrong dimension (or missing
+    cells) are reported.
+
+    Parameters
+    ----------
+    column: pd.Series
+        The column of vector strings (e.g., "0.1,0.2,0.3").
+    dim: int, optional
+        The expected dimension of the vectors (default is the most common one among the
+        non-empty rows).
+    name: str, optional
+        The name of the column, used in the report of the wrong rows.
+    dtype: np.dtype, optional
+        The type of the values (default is float32).
+    nanToNum: bool, optional
+        Whether to replace the non-finite values by 0.0 (default is True).
+
+    Returns
+    -------
+    matrix: np.ndarray
+        The (n, dim) float32 (by default) matrix of the vectors (zeros for the wrong rows).
+    badRows: np.ndarray
+        The boolean mask of the rows with a wrong dimension (or unparsable content).
+    """
+    # Variables
+    name = name or column.name or "vectors"
+    lines = [
+        (
+            x.replace("\n", " ")
+            if isinstance(x, str)
+            else " ".join(map(str, np.ravel(x))) if np.ndim(x) else ""
+        )
+        for x in column
+    ]
+    text = "\n".join(lines)
+    if "[" in text or "]" in text:
+        text = text.translate(str.maketrans("[]", "  "))
+        lines = text.split("\n")
+    # Drop the leading and trailing separators (e.g., "0.1,0.2,0.3,")
+    lines = [l.strip(" \t,") for l in lines]
+    text = "\n".join(lines)
+    # Count the values of each row (separated by commas, or else by spaces)
+    hasComma = ["," in l for l in lines]
+    counts = np.array(
+        [l.count(",") + 1 if c else len(l.split()) for l, c in zip(lines, hasComma)],
+        dtype=int,
+    )
+    isComma = any(hasComma)
+    if isComma and not all(hasComma):
+        lines = [l if c else ",".join(l.split()) for l, c in zip(lines, hasComma)]
+        text = "\n".join(lines)
+    # (empty rows never vote for the dimension and are always reported)
+    if dim is None:
+        filled = counts[counts > 0]
+        dim = int(np.bincount(filled).argmax()) if len(filled) else 0
+    badRows = (counts != dim) | (counts == 0)
+    matrix = np.zeros((len(lines), dim), dtype=dtype)
+    # Tokenize all the rows of the right dimension at once (with the C parser of pandas)
+    goodRows = np.flatnonzero(~badRows)
+    if dim and len(goodRows):
+        if badRows.any():
+            text = "\n".join(lines[i] for i in goodRows)
+        try:
+            values = pd.read_csv(
+                io.BytesIO(text.encode()),
+                header=None,
+                sep="," if isComma else r"\s+",
+                skipinitialspace=True,
+                skip_blank_lines=False,
+                dtype=dtype,
+                engine="c",
+            ).to_numpy()
+        except (ValueError, pd.errors.ParserError):
+            values = None
+        if values is not None and values.shape == (len(goodRows), dim):
+            matrix[goodRows] = values
+        else:
+            # Unparsable values: fall back to one row at a time to find them
+            for i in goodRows:
+                vec = _tokenizeFloats(lines[i].replace(",", " "), dtype)
+                if vec is not None and vec.size == dim:
+                    matrix[i] = vec
+                else:
+                    badRows[i] = True
+    if nanToNum:
+        np.nan_to_num(matrix, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    if badRows.any():
+        rows = np.flatnonzero(badRows)
+        print(
+            f"- [Warning] {len(rows):,} rows of '{name}' do not have {dim} values (rows: {rows[:10].tolist()}{' ...' if len(rows) > 10 else ''})!"
+        )
+    return matrix, badRows
+
+
+# Settings and per-host counters of the shared HTTP client, see 'configureHttpClient'
+_httpSettings = {"max_workers": 8, "retries": 3, "backoff": 0.5, "timeout": 60}
+_httpState = {"session": None, "stats": {}, "lock": threading.Lock()}
+
+
+def configureHttpClient(httpCfg: dict):
+    """
+    Configure the shared HTTP client of the loaders and downloaders (called by 'readConfigs').
+
+    Parameters
+    ----------
+    httpCfg: dict
+        The 'max_workers' of the concurrent fetches (also the connection pool size), the
+        number of 'retries' of failed requests, their exponential 'backoff' factor in seconds
+        and the 'timeout' of each request in seconds.
+    """
+    httpCfg = httpCfg or {}
+    defaults = {"max_workers": 8, "retries": 3, "backoff": 0.5, "timeout": 60}
+    for key, default in defaults.items():
+        value = httpCfg.get(key, default)
+        if not isinstance(value, (int, float)) or value < 0 or (
+            key == "max_workers" and value < 1
+        ):
+            print(f"- [Warning] Invalid HTTP '{key}' {value}. Using {default}.")
+            value = default
+        _httpSettings[key] = value
+    # The next request opens a new session with these settings
+    with _httpState["lock"]:
+        session, _httpState["session"] = _httpState["session"], None
+    if session is not None:
+        session.close()
+
+
+def _recordResponse(response, *args, **kwargs):
+    """
+    Response hook of the shared session counting the requests, bytes and latency per host.
+    """
+    elapsed = response.elapsed.total_seconds()
+    if kwargs.get("stream"):
+        size = int(response.headers.get("Content-Length") or 0)
+    else:
+        start = time.perf_counter()
+        size = len(response.content)
+        elapsed += time.perf_counter() - start
+    host = urlparse(response.url).netloc
+    with _httpState["lock"]:
+        stats = _httpState["stats"].setdefault(
+            host, {"requests": 0, "errors": 0, "bytes": 0, "seconds": 0.0}
+        )
+        stats["requests"] += 1
+        stats["errors"] += int(response.status_code >= 400)
+        stats["bytes"] += size
+        stats["seconds"] += elapsed
+
+
+def getHttpSession() -> requests.Session:
+    """
+    Get the shared HTTP session: pooled keep-alive connections, gzip transfers and
+    retries with exponential backoff of the transient failures (e.g., 429 and 503).
+
+    Returns
+    -------
+    session: requests.Session
+        The session shared by all threads of the process.
+    """
+    with _httpState["lock"]:
+        if _httpState["session"] is None:
+            retry = Retry(
+                total=int(_httpSettings["retries"]),
+                backoff_factor=_httpSettings["backoff"],
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET", "HEAD"),
+                raise_on_status=False,
+            )
+            poolSize = int(_httpSettings["max_workers"])
+            adapter = HTTPAdapter(
+                pool_connections=poolSize, pool_maxsize=poolSize, max_retries=retry
+            )
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+            session.hooks["response"].append(_recordResponse)
+            _httpState["session"] = session
+        return _httpState["session"]
+
+
+def httpGet(url: str, **kwargs) -> requests.Response:
+    """
+    Send a GET request through the shared HTTP session (with the configured timeout).
+
+    Parameters
+    ----------
+    url: str
+        The address to fetch.
+    **kwargs:
+        The extra arguments of 'requests.Session.get' (e.g., 'stream', 'params').
+
+    Returns
+    -------
+    response: requests.Response
+        The response of the request.
+    """
+    kwargs.setdefault("timeout", _httpSettings["timeout"])
+    return getHttpSession().get(url, **kwargs)
+
+
+def getHttpStats() -> dict:
+    """
+    Get the per-host counters of the shared HTTP client.
+
+    Returns
+    -------
+    stats: dict
+        A dictionary mapping the hosts to their number of 'requests' (and 'errors'),
+        the received 'bytes', the total 'seconds' and the 'mean_latency_s' of the requests.
+    """
+    with _httpState["lock"]:
+        stats = {host: dict(s) for host, s in _httpState["stats"].items()}
+    for s in stats.values():
+        s["mean_latency_s"] = s["seconds"] / s["requests"] if s["requests"] else 0.0
+    return stats
+
+
+def resetHttpStats():
+    """
+    Reset the per-host counters of the shared HTTP client.
+    """
+    with _httpState["lock"]:
+        _httpState["stats"].clear()
+
+
+# Settings of the local cache of the remote (GitHub/HuggingFace) files, see 'configureUrlCache'
+_urlCacheSettings = {"path": "", "offline": False, "max_size_mb": 0}
+
+
+class OfflineCacheMissError(ConnectionError):
+    """
+    Raised in offline mode when a remote file is not in the local cache.
+    """
+
+
+def configureUrlCache(cacheCfg: dict):
+    """
+    Configure the local cache of the remote files fetched by the loaders (called by 'readConfigs').
+    Each response is stored under a hash of its URL and validator (ETag/Last-Modified), served
+    without touching the network once cached, and evicted least-recently-used first.
+
+    Parameters
+    ----------
+    cacheCfg: dict
+        The 'path' of the cache (empty disables it), the 'offline' flag (fail fast on a miss)
+        and the 'max_size_mb' bound of the cache (0 for no limit).
+    """
+    cacheCfg = cacheCfg or {}
+    maxSizeMb = cacheCfg.get("max_size_mb", 0) or 0
+    if not isinstance(maxSizeMb, (int, float)) or maxSizeMb < 0:
+        print(f"- [Warning] Invalid URL cache size {maxSizeMb}. Using no limit.")
+        maxSizeMb = 0
+    _urlCacheSettings["path"] = cacheCfg.get("path", "") or ""
+    _urlCacheSettings["offline"] = bool(cacheCfg.get("offline", False))
+    _urlCacheSettings["max_size_mb"] = maxSizeMb
+    if _urlCacheSettings["offline"] and not _urlCacheSettings["path"]:
+        print("- [Warning] Offline mode without a URL cache path: every remote file will miss!")
+
+
+def _hashText(text: str) -> str:
+    """
+    Get the SHA-1 hex digest of a text.
+    """
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _writeAtomically(path: str, content: bytes):
+    """
+    Write a file through a temporary file, so that concurrent readers never see a partial one.
+    """
+    tmpPath = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmpPath, "wb") as tmpFile:
+        tmpFile.write(content)
+    os.replace(tmpPath, path)
+
+
+def _evictUrlCache(cachePath: str, maxSizeMb: float, keep: str = None):
+    """
+    Remove the least-recently-used cached responses until the cache fits in 'maxSizeMb'.
+    [Note]: the modification time of a blob is its last access (refreshed on each hit).
+    """
+    blobsPath = os.path.join(cachePath, "blobs")
+    blobs = []
+    for entry in os.scandir(blobsPath):
+        if entry.name.endswith(".tmp"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        blobs.append((stat.st_mtime, stat.st_size, entry.path))
+    totalSize, maxSize = sum(b[1] for b in blobs), maxSizeMb * 1024**2
+    for _, size, path in sorted(blobs):
+        if totalSize <= maxSize:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            totalSize -= size
+        except FileNotFoundError:
+            pass
+
+
+def fetchUrl(url: str) -> bytes:
+    """
+    Fetch the content of a remote file through the local cache (if configured).
+    Cached responses are served without touching the network. 'Not found' answers are
+    cached too, but only served in offline mode (online, missing files are asked again,
+    so newly published files are picked up).
+
+    Parameters
+    ----------
+    url: str
+        The address of the remote file.
+
+    Returns
+    -------
+    content: bytes
+        The content of the file.
+
+    Raises
+    ------
+    OfflineCacheMissError
+        If the file is not cached in offline mode.
+    requests.exceptions.RequestException
+        If the file cannot be fetched (e.g., 'HTTPError' for a missing file).
+    """
+    # Variables
+    cachePath = _urlCacheSettings["path"]
+    pointerPath = None
+    # Serve the hits from the cache
+    if cachePath:
+        pointerPath = os.path.join(cachePath, "urls", f"{_hashText(url)}.json")
+        try:
+            with open(pointerPath) as pointerFile:
+                pointer = json.load(pointerFile)
+            if pointer.get("status") != 404:
+                blobPath = os.path.join(cachePath, "blobs", pointer["blob"])
+                with open(blobPath, "rb") as blobFile:
+                    content = blobFile.read()
+                os.utime(blobPath)
+                return content
+            if _urlCacheSettings["offline"]:
+                raise requests.exceptions.HTTPError(
+                    f"404 Client Error: Not Found (cached) for url: {url}"
+                )
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+    if _urlCacheSettings["offline"]:
+        raise OfflineCacheMissError(
+            f"- [Error] Offline mode: '{url}' is not in the URL cache! Exiting ..."
+        )
+    # Fetch the file (only complete answers and missing files are cached)
+    response = httpGet(url)
+    if cachePath and response.status_code == 404:
+        os.makedirs(os.path.dirname(pointerPath), exist_ok=True)
+        _writeAtomically(pointerPath, json.dumps({"url": url, "status": 404}).encode())
+    response.raise_for_status()
+    content = response.content
+    if cachePath:
+        # Content-addressed by the URL and its validator (a changed file gets a new blob)
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        if validator is None:
+            validator = hashlib.sha1(content).hexdigest()
+        blobName = _hashText(f"{url}\n{validator}") + ".bin"
+        blobPath = os.path.join(cachePath, "blobs", blobName)
+        os.makedirs(os.path.dirname(blobPath), exist_ok=True)
+        os.makedirs(os.path.dirname(pointerPath), exist_ok=True)
+        _writeAtomically(blobPath, content)
+        pointer = {
+            "url": url,
+            "status": response.status_code,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "blob": blobName,
+            "size": len(content),
+        }
+        _writeAtomically(pointerPath, json.dumps(pointer).encode())
+        if _urlCacheSettings["max_size_mb"]:
+            _evictUrlCache(cachePath, _urlCacheSettings["max_size_mb"], keep=blobPath)
+    return content
+
+
+def fetchMany(urls: list, nWorkers: int = None) -> list:
+    """
+    Fetch several remote files concurrently (through the local cache, see 'fetchUrl'),
+    with at most 'nWorkers' requests in flight.
+
+    Parameters
+    ----------
+    urls: list
+        The addresses of the remote files.
+    nWorkers: int, optional
+        The maximum number of concurrent requests (default is the configured 'max_workers').
+
+    Returns
+    -------
+    contents: list
+        The contents of the files (in the order of the addresses), None for the failed ones.
+
+    Raises
+    ------
+    OfflineCacheMissError
+        If a file is not cached in offline mode.
+    """
+    # Variables
+    nWorkers = nWorkers or int(_httpSettings["max_workers"])
+
+    def fetchOrNone(url: str) -> bytes:
+        try:
+            return fetchUrl(url)
+        except requests.exceptions.RequestException:
+            return None
+
+    if nWorkers <= 1 or len(urls) <= 1:
+        return [fetchOrNone(url) for url in urls]
+    with ThreadPoolExecutor(max_workers=min(nWorkers, len(urls))) as ex:
+        return list(ex.map(fetchOrNone, urls))
+
+
 def loadJsonFromUrl(jsonUrl: str) -> dict:
     """
     Load `json` data from a given URL and return it.
@@ -73,9 +531,8 @@ def loadJsonFromUrl(jsonUrl: str) -> dict:
     # print(f"- Loading JSON data from the given URL '{jsonUrl}' ...")
     try:
         # Load JSON data from the URL
-        response = requests.get(jsonUrl)
-        response.raise_for_status()  # Raise an error for bad status codes
-        data = response.json()  # Parse JSON data
+        content = fetchUrl(jsonUrl)  # Raise an error for bad status codes
+        data = json.loads(content)  # Parse JSON data
         # print("- JSON data loaded successfully!")
         return data
     except requests.exceptions.RequestException as e:
@@ -137,6 +594,7 @@ def convertStrToListCol(dataFrame: pd.DataFrame, columnName: str) -> pd.Series:
     """
     Deserialize a string representation of a list in a pandas DataFrame back into a list.
     This is useful for reading CSV files where lists were saved as comma-separated strings.
+    [Note]: the values are parsed as floats, keeping the non-finite ones (e.g., NaN) as they are.
 
     Parameters
     ----------
@@ -150,9 +608,22 @@ def convertStrToListCol(dataFrame: pd.DataFrame, columnName: str) -> pd.Series:
     pd.Series
         A pandas Series containing the deserialized list column
     """
-    return dataFrame[columnName].apply(
-        lambda x: [float(i) for i in x.split(",")] if isinstance(x, str) else x
-    )
+    column = dataFrame[columnName]
+    values = np.empty(len(column), dtype=object)
+    values[:] = column.tolist()
+    isString = np.array([isinstance(x, str) for x in values], dtype=bool)
+    if isString.any():
+        # Parse the strings in bulk (rows of another dimension are parsed one by one)
+        strings = pd.Series(values[isString], dtype=object)
+        matrix, badRows = parseVectorColumn(
+            strings, name=columnName, dtype=np.float64, nanToNum=False
+        )
+        rows = matrix.tolist()
+        for i in np.flatnonzero(badRows):
+            rows[i] = [float(v) for v in strings.iat[i].split(",")]
+        for pos, row in zip(np.flatnonzero(isString), rows):
+            values[pos] = row
+    return pd.Series(values, index=column.index, name=columnName, dtype=object)
 
 
 def safeFilename(title: str) -> str:
@@ -173,3 +644,83 @@ def safeFilename(title: str) -> str:
     name = re.sub(r'[\\/*?:"<>|]', "", title)
     name = name.replace(" ", "_")
     return name[:100]
+
+
+def shareArrays(arrays: dict):
+    """
+    Publish NumPy arrays into shared memory blocks, so that worker processes
+    can attach them without pickling their content.
+
+    Parameters
+    ----------
+    arrays: dict
+        A dictionary mapping names to the NumPy arrays to be shared.
+
+    Returns
+    -------
+    handles: list
+        The shared memory blocks (keep them alive and release them with 'releaseSharedArrays').
+    specs: dict
+        A picklable dictionary mapping names to (block name, shape, dtype) tuples.
+    """
+    handles, specs = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        handles.append(shm)
+        specs[name] = (shm.name, array.shape, array.dtype.str)
+    return handles, specs
+
+
+def attachArrays(specs: dict, readOnly: bool = True):
+    """
+    Attach (read-only by default) the shared arrays published by 'shareArrays'.
+
+    Parameters
+    ----------
+    specs: dict
+        The dictionary of (block name, shape, dtype) tuples returned by 'shareArrays'.
+    readOnly: bool, optional
+        Whether to flag the views as read-only (default is True). Cornac's Cython
+        kernels reject read-only buffers even when they never write to them.
+
+    Returns
+    -------
+    handles: list
+        The attached shared memory blocks (keep them alive while using the arrays).
+    arrays: dict
+        A dictionary mapping names to NumPy views on the shared memory.
+    """
+    handles, arrays = [], {}
+    for name, (shmName, shape, dtype) in specs.items():
+        try:
+            shm = shared_memory.SharedMemory(name=shmName, track=False)
+        except TypeError:
+            # Python < 3.13 (pool workers share the owner's resource tracker)
+            shm = shared_memory.SharedMemory(name=shmName)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        array.flags.writeable = not readOnly
+        handles.append(shm)
+        arrays[name] = array
+    return handles, arrays
+
+
+def releaseSharedArrays(handles: list, unlink: bool = True):
+    """
+    Close (and by default unlink) the given shared memory blocks.
+
+    Parameters
+    ----------
+    handles: list
+        The shared memory blocks returned by 'shareArrays' or 'attachArrays'.
+    unlink: bool
+        Whether to free the blocks (only the owner process should unlink them).
+    """
+    for shm in handles:
+        try:
+            shm.close()
+            if unlink:
+                shm.unlink()
+        except FileNotFoundError:
+            pass